@@ -0,0 +1,45 @@
+# Generated by Django 5.2.11 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_completed_delivery_at(apps, schema_editor):
+    User = apps.get_model("core", "User")
+    Delivery = apps.get_model("logistics", "Delivery")
+    latest = (
+        Delivery.objects.filter(
+            courier=OuterRef("pk"),
+            status="COMPLETED",
+            completed_at__isnull=False,
+        )
+        .order_by("-completed_at")
+        .values("completed_at")[:1]
+    )
+    User.objects.filter(role="COURIER").update(
+        last_completed_delivery_at=Subquery(latest)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_alter_user_business_type"),
+        ("logistics", "0008_add_dispatch_configuration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="last_completed_delivery_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Mis à jour automatiquement à la complétion d'une livraison",
+                null=True,
+                verbose_name="Dernière livraison complétée",
+            ),
+        ),
+        migrations.RunPython(
+            backfill_last_completed_delivery_at, migrations.RunPython.noop
+        ),
+    ]
@@ -283,6 +283,13 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name="Meilleure série"
     )
     
+    last_completed_delivery_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Dernière livraison complétée",
+        help_text="Mis à jour automatiquement à la complétion d'une livraison"
+    )
+    
     # Response Time Tracking
     average_response_seconds = models.PositiveIntegerField(
         default=0,
@@ -129,6 +129,9 @@ class CourierViewSet(viewsets.ViewSet):
         request.user.last_location_updated = timezone.now()
         request.user.save(update_fields=['last_location', 'last_location_updated'])
         
+        from logistics.services.courier_geo_index import CourierGeoIndex
+        CourierGeoIndex.update_location(request.user.id, lat, lng)
+        
         return Response({
             'message': 'Position mise à jour.',
             'location': {'latitude': lat, 'longitude': lng}
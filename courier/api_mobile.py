@@ -21,6 +21,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from core.models import User, UserRole
 from core.gamification import GamificationService, LEVEL_THRESHOLDS
 from logistics.models import Delivery, DeliveryStatus
+from logistics.services.courier_geo_index import CourierGeoIndex
 from finance.models import Transaction, WalletService, TransactionType
 
 logger = logging.getLogger(__name__)
@@ -333,6 +334,7 @@ class ToggleOnlineView(APIView):
         if courier.is_online:
             courier.last_online_at = timezone.now()
         courier.save(update_fields=['is_online', 'last_online_at'])
+        CourierGeoIndex.sync(courier)
         
         return Response({
             'is_online': courier.is_online,
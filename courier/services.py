@@ -18,6 +18,7 @@ from core.gamification import (
     get_courier_badges_summary, LEVEL_THRESHOLDS
 )
 from logistics.models import Delivery, DeliveryStatus
+from logistics.services.courier_geo_index import CourierGeoIndex
 from finance.models import Transaction, TransactionType
 
 
@@ -345,6 +346,7 @@ class AvailabilityService:
         if courier.is_online:
             courier.last_online_at = timezone.now()
         courier.save(update_fields=['is_online', 'last_online_at'])
+        CourierGeoIndex.sync(courier)
         return courier.is_online
     
     @staticmethod
@@ -354,3 +356,4 @@ class AvailabilityService:
         if online:
             courier.last_online_at = timezone.now()
         courier.save(update_fields=['is_online', 'last_online_at'])
+        CourierGeoIndex.sync(courier)
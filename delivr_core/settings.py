@@ -269,6 +269,11 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'logistics.tasks.cleanup_traffic_data',
         'schedule': crontab(minute='*/5'),
     },
+    # Backfill the courier geo index used by dispatch every 5 minutes
+    'rebuild-courier-geo-index': {
+        'task': 'logistics.tasks.rebuild_courier_geo_index',
+        'schedule': crontab(minute='*/5'),
+    },
     # Refresh traffic heatmap cache every 2 minutes
     'refresh-traffic-heatmap': {
         'task': 'logistics.tasks.aggregate_traffic_heatmap',
@@ -283,6 +288,10 @@ CELERY_BEAT_SCHEDULE = {
 # OSRM Routing Service
 OSRM_BASE_URL = config('OSRM_BASE_URL', default='http://osrm:5000')
 
+# Smart routing: rank alternatives by capacity-weighted METIS score
+# instead of raw traffic penalty
+USE_METIS_RANKING = config('USE_METIS_RANKING', default=False, cast=bool)
+
 # Nominatim Geocoding
 NOMINATIM_BASE_URL = config('NOMINATIM_BASE_URL', default='http://nominatim:8080')
 
@@ -0,0 +1,11 @@
+"""
+Django settings for the DELIVR-CM test suite.
+
+Loaded by pytest (see pytest.ini); never used by the web, ASGI or
+Celery processes.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# PBKDF2 is deliberately slow and every fixture user pays for it
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
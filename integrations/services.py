@@ -6,6 +6,7 @@ Uses Redis caching for performance.
 """
 
 import logging
+import time
 from typing import Any, Optional
 from django.conf import settings
 from django.core.cache import cache
@@ -42,6 +43,12 @@ class ConfigService:
     CACHE_KEY = 'integration_config_v1'
     CACHE_TTL = 300  # 5 minutes
     
+    # Per-process copy in front of Redis: (loaded_at, config).
+    # Pricing reads the config on every quote; other workers pick up
+    # an admin change within LOCAL_CACHE_TTL seconds.
+    LOCAL_CACHE_TTL = 30
+    _local_config = None
+    
     @classmethod
     def get_config(cls) -> dict:
         """
@@ -55,9 +62,15 @@ class ConfigService:
         Returns:
             dict: Complete configuration dictionary
         """
-        # Try cache first
+        local = cls._local_config
+        if local is not None and time.monotonic() - local[0] < cls.LOCAL_CACHE_TTL:
+            # Callers may tweak the dict: hand out a copy
+            return dict(local[1])
+        
+        # Then the shared cache
         cached = cache.get(cls.CACHE_KEY)
         if cached:
+            cls._local_config = (time.monotonic(), dict(cached))
             return cached
         
         # Import here to avoid circular imports
@@ -93,6 +106,7 @@ class ConfigService:
             
             # Cache the result
             cache.set(cls.CACHE_KEY, result, timeout=cls.CACHE_TTL)
+            cls._local_config = (time.monotonic(), dict(result))
             
             return result
             
@@ -123,7 +137,8 @@ class ConfigService:
     
     @classmethod
     def invalidate_cache(cls) -> None:
-        """Invalidate the configuration cache."""
+        """Invalidate the shared and the per-process configuration cache."""
+        cls._local_config = None
         cache.delete(cls.CACHE_KEY)
         logger.info("[ConfigService] Cache invalidated")
     
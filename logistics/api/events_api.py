@@ -151,12 +151,6 @@ def _list_events(request):
         if event_type:
             events = events.filter(event_type=event_type)
         
-        # Auto-deactivate expired events with low confidence
-        expired_low_conf = events.filter(
-            expires_at__lt=now,
-        )
-        expired_low_conf.update(is_active=False)
-        
         # Limit results
         events = events[:50]
         
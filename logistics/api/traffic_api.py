@@ -13,6 +13,8 @@ Endpoints:
 """
 
 import logging
+import orjson
+from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -325,7 +327,9 @@ def smart_route(request):
             f"Warnings: {len(route.warnings)}"
         )
         
-        return Response(result)
+        # Large coordinate lists: serialize with orjson instead of the
+        # DRF renderer
+        return HttpResponse(orjson.dumps(result), content_type='application/json')
         
     except Exception as e:
         logger.exception(f"[SMART-ROUTE] Error: {e}")
@@ -307,6 +307,7 @@ class CourierConsumer(AsyncJsonWebsocketConsumer):
         from django.contrib.gis.geos import Point
         from django.utils import timezone
         from core.models import User
+        from logistics.services.courier_geo_index import CourierGeoIndex
         
         if not self.courier_id:
             return
@@ -316,6 +317,7 @@ class CourierConsumer(AsyncJsonWebsocketConsumer):
                 last_location=Point(longitude, latitude, srid=4326),
                 last_location_updated=timezone.now()
             )
+            CourierGeoIndex.update_location(self.courier_id, latitude, longitude)
         except Exception as e:
             logger.error(f"[WS] Failed to update courier location: {e}")
     
@@ -5,8 +5,11 @@ Utility functions to broadcast events via Django Channels.
 Used by signals, views, and services to push real-time updates.
 """
 
+import asyncio
+import atexit
 import logging
-from typing import Optional
+import threading
+from typing import List, Optional, Tuple
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -41,6 +44,36 @@ def _send_group_event(group_name: str, event: dict):
 # DELIVERY EVENTS
 # ============================================
 
+def _status_events(
+    delivery_id: str,
+    new_status: str,
+    message: str,
+    timestamp: str
+) -> List[Tuple[str, dict]]:
+    """Build the (group, event) pairs sent for a delivery status change."""
+    return [
+        # Clients tracking this delivery
+        (
+            f'delivery_{delivery_id}',
+            {
+                'type': 'delivery_status_update',
+                'status': new_status,
+                'timestamp': timestamp,
+                'message': message,
+            },
+        ),
+        # Dispatch zone
+        (
+            'dispatch_DOUALA',  # TODO: Get city from delivery
+            {
+                'type': 'delivery_status_change',
+                'delivery_id': str(delivery_id),
+                'new_status': new_status,
+            },
+        ),
+    ]
+
+
 def broadcast_delivery_status(
     delivery_id: str,
     new_status: str,
@@ -56,32 +89,107 @@ def broadcast_delivery_status(
     """
     timestamp = timezone.now().isoformat()
     
-    # Notify clients tracking this delivery
-    _send_group_event(
-        f'delivery_{delivery_id}',
-        {
-            'type': 'delivery_status_update',
-            'status': new_status,
-            'timestamp': timestamp,
-            'message': message,
-        }
-    )
-    
-    # Notify dispatch zone
-    _send_group_event(
-        'dispatch_DOUALA',  # TODO: Get city from delivery
-        {
-            'type': 'delivery_status_change',
-            'delivery_id': str(delivery_id),
-            'new_status': new_status,
-        }
-    )
+    for group_name, event in _status_events(delivery_id, new_status, message, timestamp):
+        _send_group_event(group_name, event)
     
     logger.debug(
         f"[EVENTS] Broadcasted status change: {delivery_id[:8]} -> {new_status}"
     )
 
 
+# Status changes queued by signals are flushed together: every
+# STATUS_BATCH_DELAY seconds or as soon as STATUS_BATCH_SIZE are pending.
+STATUS_BATCH_DELAY = 0.05
+STATUS_BATCH_SIZE = 100
+
+_status_buffer: List[Tuple[str, str, str, str]] = []
+_status_lock = threading.Lock()
+_status_timer: Optional[threading.Timer] = None
+
+
+def queue_delivery_status(
+    delivery_id: str,
+    new_status: str,
+    message: str = ""
+):
+    """
+    Queue a delivery status broadcast for the next batched flush.
+    
+    Bursts of status changes (bulk assignment, imports) are sent through
+    one event loop entry with the groups served concurrently, instead of
+    one blocking round-trip per event.
+    """
+    global _status_timer
+    
+    entry = (delivery_id, new_status, message, timezone.now().isoformat())
+    flush_now = False
+    
+    with _status_lock:
+        _status_buffer.append(entry)
+        
+        if len(_status_buffer) >= STATUS_BATCH_SIZE:
+            flush_now = True
+        elif _status_timer is None:
+            _status_timer = threading.Timer(STATUS_BATCH_DELAY, flush_delivery_statuses)
+            _status_timer.daemon = True
+            _status_timer.start()
+    
+    if flush_now:
+        flush_delivery_statuses()
+
+
+def flush_delivery_statuses() -> int:
+    """Send every queued status change. Returns the number of deliveries sent."""
+    global _status_timer
+    
+    with _status_lock:
+        batch = _status_buffer[:]
+        _status_buffer.clear()
+        if _status_timer is not None:
+            _status_timer.cancel()
+            _status_timer = None
+    
+    if not batch:
+        return 0
+    
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return 0
+    
+    # Events per group, in queue order: a delivery that moves twice within
+    # one batch must reach its trackers as ASSIGNED then PICKED_UP
+    groups = {}
+    for delivery_id, new_status, message, timestamp in batch:
+        for group_name, event in _status_events(delivery_id, new_status, message, timestamp):
+            groups.setdefault(group_name, []).append(event)
+    
+    async def _send_group(group_name, events):
+        for event in events:
+            try:
+                await channel_layer.group_send(group_name, event)
+            except Exception as e:
+                logger.error(f"[EVENTS] Failed to send to group {group_name}: {e}")
+    
+    async def _send_all():
+        # Sequential within a group, concurrent across groups
+        await asyncio.gather(
+            *(_send_group(group_name, events) for group_name, events in groups.items())
+        )
+    
+    try:
+        from asgiref.sync import async_to_sync
+        async_to_sync(_send_all)()
+    except Exception as e:
+        logger.error(f"[EVENTS] Failed to flush {len(batch)} status changes: {e}")
+        return 0
+    
+    logger.debug(f"[EVENTS] Flushed {len(batch)} status changes")
+    return len(batch)
+
+
+atexit.register(flush_delivery_statuses)
+
+
 def broadcast_delivery_update(delivery):
     """Convenience wrapper for broadcasting delivery status changes."""
     return broadcast_delivery_status(
@@ -4,6 +4,8 @@ LOGISTICS App - Deliveries & Routing for DELIVR-CM
 Handles: Deliveries, Neighborhoods, Dispatch, Routing
 """
 
+import copy
+import time
 import uuid
 import random
 import string
@@ -12,6 +14,11 @@ from django.conf import settings
 from decimal import Decimal
 
 
+def generate_otp(length: int = 4) -> str:
+    """Random numeric OTP code (delivery and pickup handoffs)."""
+    return ''.join(random.choices(string.digits, k=length))
+
+
 class DeliveryStatus(models.TextChoices):
     """Delivery status enumeration."""
     PENDING = 'PENDING', 'En attente'
@@ -258,12 +265,25 @@ class Delivery(models.Model):
     def save(self, *args, **kwargs):
         # Generate delivery OTP if not set (for recipient)
         if not self.otp_code:
-            self.otp_code = ''.join(random.choices(string.digits, k=4))
+            self.otp_code = generate_otp()
         # Generate pickup OTP if not set (for sender)
         if not self.pickup_otp:
-            self.pickup_otp = ''.join(random.choices(string.digits, k=4))
+            self.pickup_otp = generate_otp()
         super().save(*args, **kwargs)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot the loaded status so signals can detect transitions
+        # without re-reading the row on save
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'status' in fields:
+            self._loaded_status = self.status
+
     @property
     def is_pending(self) -> bool:
         return self.status == DeliveryStatus.PENDING
@@ -784,7 +804,19 @@ class DispatchConfiguration(models.Model):
         self.pk = 1
         super().save(*args, **kwargs)
         # Invalidate cache
+        self.clear_cache()
+    
+    # Per-process copy in front of the shared cache: (loaded_at, config).
+    # Other workers pick up an admin change within LOCAL_CACHE_TTL seconds.
+    LOCAL_CACHE_TTL = 5
+    _local_config = None
+    
+    @classmethod
+    def clear_cache(cls):
+        """Drop both the shared and the per-process cached config."""
         from django.core.cache import cache
+        
+        cls._local_config = None
         cache.delete('dispatch_configuration')
     
     @classmethod
@@ -792,14 +824,20 @@ class DispatchConfiguration(models.Model):
         """
         Get the active dispatch configuration.
         Creates default config if none exists.
-        Uses cache for performance.
+        Uses a short per-process cache, then the shared cache.
         """
+        local = cls._local_config
+        if local is not None and time.monotonic() - local[0] < cls.LOCAL_CACHE_TTL:
+            # Callers may tweak the instance: hand out a copy
+            return copy.copy(local[1])
+        
         from django.core.cache import cache
         
         config = cache.get('dispatch_configuration')
         if config is None:
             config, _ = cls.objects.get_or_create(pk=1)
             cache.set('dispatch_configuration', config, 600)  # Cache 10 min
+        cls._local_config = (time.monotonic(), copy.copy(config))
         return config
     
     def get_level_score(self, level: str) -> float:
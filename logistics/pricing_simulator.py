@@ -6,7 +6,7 @@ Allows testing and validating pricing configuration before deployment.
 
 import io
 import csv
-from decimal import Decimal, ROUND_UP
+from decimal import Decimal, ROUND_CEILING
 from typing import Optional
 from django.conf import settings
 
@@ -41,7 +41,9 @@ class PricingSimulator:
     
     def round_to_hundred(self, amount: Decimal) -> Decimal:
         """Round up to nearest 100 XAF."""
-        return (amount / 100).quantize(Decimal('1'), rounding=ROUND_UP) * 100
+        # Ceil to whole XAF once, then ceil-divide in int arithmetic
+        whole = int(amount.to_integral_value(rounding=ROUND_CEILING))
+        return Decimal(-(-whole // 100) * 100)
     
     def calculate_for_distance(self, distance_km: float) -> dict:
         """
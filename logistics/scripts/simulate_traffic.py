@@ -11,7 +11,6 @@ Or just:
     docker compose exec -T web python manage.py shell -c "exec(open('logistics/scripts/simulate_traffic.py').read())"
 """
 
-import json
 import time
 import random
 from logistics.services.traffic_service import TrafficService
@@ -151,6 +150,15 @@ def interpolate_points(p1, p2, step_deg=0.0008):
         points.append((lat, lng))
     return points
 
+def store_fix(courier_id, lat, lng, timestamp):
+    """Write a courier fix the way TrafficService stores it (Redis hash)."""
+    key = f"traffic:fix:{courier_id}"
+    pipe = r.pipeline(transaction=False)
+    pipe.delete(key)
+    pipe.hset(key, mapping={"lat": lat, "lng": lng, "ts": timestamp})
+    pipe.expire(key, 300)
+    pipe.execute()
+
 for pass_idx in range(SIMULATION_PASSES):
     print(f"\n🔄 Vague de simulation {pass_idx + 1}/{SIMULATION_PASSES}")
     
@@ -165,16 +173,7 @@ for pass_idx in range(SIMULATION_PASSES):
         current_lat, current_lng = waypoints[0]
         
         # Initialize position in Redis without calculating speed (first fix)
-        r.setex(
-            f"traffic:fix:{courier_id}", 
-            300, 
-            json.dumps({
-                "courier_id": courier_id,
-                "latitude": current_lat,
-                "longitude": current_lng,
-                "timestamp": time.time() - 60 # Assume started 1 min ago
-            })
-        )
+        store_fix(courier_id, current_lat, current_lng, time.time() - 60)  # Assume started 1 min ago
         
         points_processed = 0
         
@@ -204,13 +203,7 @@ for pass_idx in range(SIMULATION_PASSES):
                 
                 # Update "previous" fix timestamp to effectively simulate time passing
                 # In a real scenario, we'd wait. Here we fake the previous timestamp.
-                prev_fix = {
-                    "courier_id": courier_id,
-                    "latitude": current_lat,
-                    "longitude": current_lng,
-                    "timestamp": time.time() - dt
-                }
-                r.setex(f"traffic:fix:{courier_id}", 300, json.dumps(prev_fix))
+                store_fix(courier_id, current_lat, current_lng, time.time() - dt)
                 
                 # Ingest new location
                 speed = TrafficService.ingest_location(courier_id, lat, lng)
@@ -218,7 +211,7 @@ for pass_idx in range(SIMULATION_PASSES):
                 if speed is not None:
                     cell_id = TrafficService.latlng_to_cell(lat, lng)
                     level = TrafficService.speed_to_level(speed)
-                    if cell_id:
+                    if cell_id is not None:
                         total_cells.add(cell_id)
                         # Only print occasionally to avoid spam
                         # if random.random() < 0.2:
@@ -0,0 +1,156 @@
+"""
+LOGISTICS App - Courier Geo Index for DELIVR-CM
+
+Keeps the last known position of online couriers in a Redis geo set so
+that dispatch can pre-select nearby couriers with a single GEOSEARCH
+instead of a PostGIS distance scan over the users table.
+
+Architecture:
+    Courier location update (WebSocket / REST)
+        → CourierGeoIndex.update_location()
+            → GEOADD couriers:online <lng> <lat> <courier_id>
+    SmartDispatchService._query_nearby_couriers()
+        → CourierGeoIndex.search()
+            → GEOSEARCH ... BYRADIUS <km> ASC WITHDIST
+        → User.objects.filter(id__in=ids)   (hydration only)
+    logistics.tasks.rebuild_courier_geo_index (every 5 min)
+        → CourierGeoIndex.rebuild()
+            → GEOADD NX of every online courier + SET couriers:online:warm
+
+Postgres stays the source of truth: the index is only trusted while the
+warm marker set by a full rebuild exists. After a deploy, a Redis flush
+or a long idle period, callers fall back to the PostGIS query until the
+next rebuild has backfilled couriers that never sent a position.
+"""
+
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from logistics.services.traffic_service import TrafficService
+
+logger = logging.getLogger(__name__)
+
+
+# Redis key of the geo set holding online courier positions
+GEO_KEY = 'couriers:online'
+
+# TTL of the whole geo set, refreshed on every location update.
+# If no courier reports a position for this long, the index is dropped
+# and dispatch falls back to PostGIS.
+GEO_TTL = 600
+
+# Marker set by a full rebuild from Postgres: without it the geo set may
+# be missing couriers that are online but have not moved since.
+WARM_KEY = 'couriers:online:warm'
+
+
+class CourierGeoIndex:
+    """Redis geo set of online courier positions."""
+
+    @staticmethod
+    def update_location(courier_id, latitude: float, longitude: float) -> None:
+        """Add or move a courier in the geo index."""
+        r = TrafficService._get_redis()
+        if not r:
+            return
+
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.geoadd(GEO_KEY, (longitude, latitude, str(courier_id)))
+            pipe.expire(GEO_KEY, GEO_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"[GEO_INDEX] Failed to index courier {courier_id}: {e}")
+
+    @staticmethod
+    def remove(courier_id) -> None:
+        """Remove a courier from the geo index (e.g. going offline)."""
+        r = TrafficService._get_redis()
+        if not r:
+            return
+
+        try:
+            r.zrem(GEO_KEY, str(courier_id))
+        except Exception as e:
+            logger.debug(f"[GEO_INDEX] Failed to remove courier {courier_id}: {e}")
+
+    @staticmethod
+    def sync(courier) -> None:
+        """Index a courier from its stored position, or drop it if offline."""
+        location = courier.last_location
+        if courier.is_online and location:
+            CourierGeoIndex.update_location(courier.id, location.y, location.x)
+        else:
+            CourierGeoIndex.remove(courier.id)
+
+    @staticmethod
+    def rebuild(positions: Iterable[Tuple[str, float, float]]) -> Optional[int]:
+        """
+        Backfill the index with (courier_id, latitude, longitude) positions
+        and mark it as complete.
+
+        Uses GEOADD NX so a fresher live position already in the index is
+        never overwritten by the stored one.
+
+        Returns:
+            Number of positions sent, or None if Redis is unavailable.
+        """
+        r = TrafficService._get_redis()
+        if not r:
+            return None
+
+        values = []
+        for courier_id, latitude, longitude in positions:
+            values.extend((longitude, latitude, str(courier_id)))
+
+        try:
+            pipe = r.pipeline(transaction=False)
+            if values:
+                pipe.geoadd(GEO_KEY, values, nx=True)
+                pipe.expire(GEO_KEY, GEO_TTL)
+            pipe.set(WARM_KEY, 1, ex=GEO_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[GEO_INDEX] Rebuild failed: {e}")
+            return None
+
+        return len(values) // 3
+
+    @staticmethod
+    def search(
+        latitude: float,
+        longitude: float,
+        radius_km: float
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        Find indexed couriers within radius of a point.
+
+        Returns:
+            List of (courier_id, distance_km) tuples sorted by distance,
+            or None if Redis is unavailable or the index is not warm.
+        """
+        r = TrafficService._get_redis()
+        if not r:
+            return None
+
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.exists(WARM_KEY)
+            pipe.geosearch(
+                GEO_KEY,
+                longitude=longitude,
+                latitude=latitude,
+                radius=radius_km,
+                unit='km',
+                sort='ASC',
+                withdist=True,
+            )
+            warm, results = pipe.execute()
+        except Exception as e:
+            logger.debug(f"[GEO_INDEX] GEOSEARCH failed: {e}")
+            return None
+
+        if not warm:
+            return None
+
+        return [(member, float(dist)) for member, dist in results]
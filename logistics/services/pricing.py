@@ -7,13 +7,18 @@ Calculates delivery prices based on distance (OSRM routing).
 import math
 import logging
 import requests
-from decimal import Decimal, ROUND_UP
+from decimal import Decimal, ROUND_CEILING
 from typing import Tuple, Optional
 from django.conf import settings
 from django.contrib.gis.geos import Point
 
 logger = logging.getLogger(__name__)
 
+# Haversine constants (Earth radius 6371 km)
+EARTH_DIAMETER_KM = 2 * 6371
+DEG_TO_RAD = math.pi / 180
+HALF_DEG_TO_RAD = DEG_TO_RAD / 2
+
 
 class PricingEngine:
     """
@@ -91,18 +96,19 @@ class PricingEngine:
         Returns:
             Distance in km
         """
-        R = 6371  # Earth radius in km
-        
-        lat1, lon1 = math.radians(origin.y), math.radians(origin.x)
-        lat2, lon2 = math.radians(destination.y), math.radians(destination.x)
+        # Plain floats from here on: one GEOS read per coordinate
+        lng1, lat1 = origin.x, origin.y
+        lng2, lat2 = destination.x, destination.y
         
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
+        sin_dlat = math.sin((lat2 - lat1) * HALF_DEG_TO_RAD)
+        sin_dlng = math.sin((lng2 - lng1) * HALF_DEG_TO_RAD)
         
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
+        a = (
+            sin_dlat * sin_dlat
+            + math.cos(lat1 * DEG_TO_RAD) * math.cos(lat2 * DEG_TO_RAD) * sin_dlng * sin_dlng
+        )
         
-        return R * c
+        return EARTH_DIAMETER_KM * math.asin(math.sqrt(a))
 
     def round_to_hundred(self, amount: Decimal) -> Decimal:
         """
@@ -110,7 +116,9 @@ class PricingEngine:
         
         Example: 1320 -> 1400, 1500 -> 1500, 1501 -> 1600
         """
-        return (amount / 100).quantize(Decimal('1'), rounding=ROUND_UP) * 100
+        # Ceil to whole XAF once, then ceil-divide in int arithmetic
+        whole = int(amount.to_integral_value(rounding=ROUND_CEILING))
+        return Decimal(-(-whole // 100) * 100)
 
     def calculate_price(
         self, 
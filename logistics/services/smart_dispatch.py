@@ -22,11 +22,14 @@ All weights and thresholds are stored in the database and can be
 adjusted by admins in real-time via Django Admin.
 """
 
+import heapq
 import logging
+from operator import attrgetter
 from typing import List, Optional, Dict, Any, Tuple
 from decimal import Decimal
 from dataclasses import dataclass
 from datetime import timedelta
+from functools import lru_cache
 
 from django.contrib.gis.geos import Point
 from django.contrib.gis.db.models.functions import Distance
@@ -37,6 +40,7 @@ from django.utils import timezone
 from django.core.cache import cache
 
 from logistics.models import Delivery, DeliveryStatus, DispatchConfiguration
+from logistics.services.courier_geo_index import CourierGeoIndex
 from core.models import User, UserRole
 
 logger = logging.getLogger(__name__)
@@ -75,6 +79,47 @@ class CourierScore:
         }
 
 
+# ============================================
+# WEIGHTED SCORER (specialized per config)
+# ============================================
+
+# Scoring factors, in the order the generated scorer takes them
+SCORE_FACTORS = (
+    'distance', 'rating', 'history', 'availability',
+    'financial', 'response', 'level', 'acceptance',
+)
+
+# Highest value each factor can reach (see _calculate_courier_score):
+# the response curve peaks just above 30 s at 80 + 30 * 0.67.
+# Distance is computed per candidate, level comes from the config.
+FACTOR_MAX_SCORES = {
+    'rating': 100, 'history': 100, 'availability': 100,
+    'financial': 100, 'response': 100.1, 'acceptance': 100,
+}
+
+# Slack for the rounding of the final score and of the streak bonus
+SCORE_ROUNDING_SLACK = 0.1
+
+
+@lru_cache(maxsize=8)
+def _compile_scorer(weights: Tuple[float, ...]):
+    """
+    Generate a straight-line weighted-sum function for a set of weights.
+    
+    The weights are baked in as literals, so each call is plain
+    arithmetic on its arguments instead of eight config attribute
+    lookups. Cached by weights: editing the config yields a new scorer.
+    """
+    terms = ' + '.join(
+        f"{name} * {float(weight)!r}"
+        for name, weight in zip(SCORE_FACTORS, weights)
+    )
+    source = f"def _scorer({', '.join(SCORE_FACTORS)}):\n    return {terms}\n"
+    namespace = {}
+    exec(compile(source, '<dispatch_scorer>', 'exec'), namespace)
+    return namespace['_scorer']
+
+
 # ============================================
 # SMART DISPATCH SERVICE
 # ============================================
@@ -93,6 +138,9 @@ class SmartDispatchService:
     
     def __init__(self, config: DispatchConfiguration = None):
         self.config = config or DispatchConfiguration.get_config()
+        self._scorer = _compile_scorer(tuple(
+            getattr(self.config, f'weight_{name}') for name in SCORE_FACTORS
+        ))
     
     def find_optimal_couriers(
         self,
@@ -130,24 +178,44 @@ class SmartDispatchService:
             current_radius += self.config.radius_increment_km
             logger.debug(f"[SMART_DISPATCH] Expanding radius to {current_radius}km")
         
+        # Keep only candidates that can still reach the threshold
+        scorable = []
+        for courier, distance_km in candidates[:self.config.max_couriers_to_score]:
+            # Candidates are sorted by distance, so once the best possible
+            # score of this courier cannot reach the threshold, none of the
+            # following ones can either (unless distance is weighted
+            # negatively): skip their stats lookups entirely.
+            if self._max_possible_score(distance_km) < self.config.min_score_threshold:
+                if self.config.weight_distance >= 0:
+                    break
+                continue
+            scorable.append((courier, distance_km))
+        
+        # Fetch history stats for all of them in one cache/DB round-trip
+        histories = self._bulk_get_history_cached([courier.id for courier, _ in scorable])
+        
         # Score all candidates
         scored_couriers = []
-        for courier, distance_km in candidates[:self.config.max_couriers_to_score]:
-            score = self._calculate_courier_score(courier, distance_km)
+        for courier, distance_km in scorable:
+            score = self._calculate_courier_score(
+                courier, distance_km, history=histories[str(courier.id)]
+            )
             
             # Only include couriers above minimum threshold
             if score.total_with_bonuses >= self.config.min_score_threshold:
                 scored_couriers.append(score)
         
-        # Sort by total score (highest first)
-        scored_couriers.sort(key=lambda x: x.total_with_bonuses, reverse=True)
+        # Top-K by total score (highest first)
+        top_couriers = heapq.nlargest(
+            max_results, scored_couriers, key=attrgetter('total_with_bonuses')
+        )
         
         logger.info(
             f"[SMART_DISPATCH] Found {len(scored_couriers)} qualified couriers "
             f"(radius: {current_radius}km, threshold: {self.config.min_score_threshold})"
         )
         
-        return scored_couriers[:max_results]
+        return top_couriers
     
     def _query_nearby_couriers(
         self,
@@ -165,23 +233,28 @@ class SmartDispatchService:
         - Not blocked by debt
         - Onboarding approved or in probation
         
+        The Redis geo index is tried first (already sorted by distance);
+        PostGIS is used when the index is unavailable, not yet rebuilt,
+        or yields no eligible courier.
+        
         Returns:
             List of (courier, distance_km) tuples
         """
-        couriers = User.objects.filter(
-            role=UserRole.COURIER,
-            is_active=True,
-            is_online=True,
-            last_location__isnull=False,
-            onboarding_status__in=['APPROVED', 'PROBATION'],
-        ).annotate(
-            raw_distance=Distance('last_location', pickup_point)
-        ).filter(
-            raw_distance__lte=D(km=radius_km)
-        ).order_by('raw_distance')
+        candidates = self._query_geo_index(pickup_point, radius_km)
+        if candidates is None:
+            couriers = self._eligible_couriers().annotate(
+                raw_distance=Distance('last_location', pickup_point)
+            ).filter(
+                raw_distance__lte=D(km=radius_km)
+            ).order_by('raw_distance')
+            
+            candidates = [
+                (courier, courier.raw_distance.km if courier.raw_distance else 999)
+                for courier in couriers
+            ]
         
         result = []
-        for courier in couriers:
+        for courier, distance_km in candidates:
             # Check if not blocked by debt
             if courier.wallet_balance <= -courier.debt_ceiling:
                 logger.debug(
@@ -190,16 +263,60 @@ class SmartDispatchService:
                 )
                 continue
             
-            # Convert distance to km
-            distance_km = courier.raw_distance.km if courier.raw_distance else 999
             result.append((courier, distance_km))
         
         return result
     
+    @staticmethod
+    def _eligible_couriers():
+        """Base queryset of couriers that may receive dispatches."""
+        return User.objects.filter(
+            role=UserRole.COURIER,
+            is_active=True,
+            is_online=True,
+            last_location__isnull=False,
+            onboarding_status__in=['APPROVED', 'PROBATION'],
+        )
+    
+    def _query_geo_index(
+        self,
+        pickup_point: Point,
+        radius_km: float
+    ) -> Optional[List[Tuple[User, float]]]:
+        """
+        Pre-select couriers from the Redis geo index.
+        
+        Returns:
+            List of (courier, distance_km) tuples sorted by distance,
+            or None if the index is unavailable, not warm, or has no
+            eligible courier in range.
+        """
+        hits = CourierGeoIndex.search(pickup_point.y, pickup_point.x, radius_km)
+        if not hits:
+            return None
+        
+        # Single PK lookup to hydrate; eligibility filters still apply
+        # so stale index entries (offline, blocked...) are dropped here.
+        couriers = {
+            str(courier.id): courier
+            for courier in self._eligible_couriers().filter(
+                id__in=[courier_id for courier_id, _ in hits]
+            )
+        }
+        
+        candidates = [
+            (couriers[courier_id], distance_km)
+            for courier_id, distance_km in hits
+            if courier_id in couriers
+        ]
+        # Only stale entries in range: let PostGIS have the final say
+        return candidates or None
+    
     def _calculate_courier_score(
         self,
         courier: User,
-        distance_km: float
+        distance_km: float,
+        history: Dict[str, int] = None
     ) -> CourierScore:
         """
         Calculate composite score for a courier using 8 weighted factors.
@@ -212,16 +329,7 @@ class SmartDispatchService:
         bonuses = {}
         
         # ====== 1. DISTANCE SCORE (0-100) ======
-        # Closer is better: 100 within perfect range, linear decay to 0
-        if distance_km <= config.distance_perfect_km:
-            distance_score = 100
-        elif distance_km >= config.distance_zero_km:
-            distance_score = 0
-        else:
-            # Linear interpolation between perfect and zero
-            range_km = config.distance_zero_km - config.distance_perfect_km
-            distance_score = max(0, 100 * (1 - (distance_km - config.distance_perfect_km) / range_km))
-        breakdown['distance'] = round(distance_score, 1)
+        breakdown['distance'] = round(self._distance_score(distance_km), 1)
         
         # ====== 2. RATING SCORE (0-100) ======
         # Based on average_rating (/5) from the User model
@@ -241,7 +349,8 @@ class SmartDispatchService:
         
         # ====== 3. HISTORY SCORE (0-100) ======
         # Based on delivery success rate (last 30 days)
-        history = self._get_courier_history(courier)
+        if history is None:
+            history = self._get_courier_history(courier)
         if history['total_deliveries'] == 0:
             history_score = 50  # Neutral for new couriers
         else:
@@ -314,16 +423,7 @@ class SmartDispatchService:
         breakdown['acceptance'] = round(min(100, acceptance_score), 1)
         
         # ====== WEIGHTED TOTAL ======
-        total_score = (
-            breakdown['distance'] * config.weight_distance +
-            breakdown['rating'] * config.weight_rating +
-            breakdown['history'] * config.weight_history +
-            breakdown['availability'] * config.weight_availability +
-            breakdown['financial'] * config.weight_financial +
-            breakdown['response'] * config.weight_response +
-            breakdown['level'] * config.weight_level +
-            breakdown['acceptance'] * config.weight_acceptance
-        )
+        total_score = self._scorer(**breakdown)
         
         # ====== BONUSES & PENALTIES ======
         
@@ -347,58 +447,116 @@ class SmartDispatchService:
             bonuses=bonuses
         )
     
+    def _distance_score(self, distance_km: float) -> float:
+        """Closer is better: 100 within perfect range, linear decay to 0."""
+        config = self.config
+        if distance_km <= config.distance_perfect_km:
+            return 100
+        if distance_km >= config.distance_zero_km:
+            return 0
+        # Linear interpolation between perfect and zero
+        range_km = config.distance_zero_km - config.distance_perfect_km
+        return max(0, 100 * (1 - (distance_km - config.distance_perfect_km) / range_km))
+    
+    def _max_possible_score(self, distance_km: float) -> float:
+        """
+        Upper bound of total_with_bonuses for a courier at this distance.
+        
+        Assumes every other factor reaches its maximum and the full streak
+        bonus applies; only the distance factor is actually known. Goes
+        through the same scorer as the real score, so the bound uses the
+        exact weights.
+        """
+        config = self.config
+        level_scores = (
+            config.level_score_bronze, config.level_score_silver,
+            config.level_score_gold, config.level_score_platinum,
+        )
+        # Sub-scores never go below 0 except admin-set level scores:
+        # a negative weight is maximized by the lowest value
+        bounds = {name: (0, high) for name, high in FACTOR_MAX_SCORES.items()}
+        bounds['level'] = (min(level_scores), max(level_scores))
+        
+        factors = {
+            name: high if getattr(config, f'weight_{name}') >= 0 else low
+            for name, (low, high) in bounds.items()
+        }
+        max_bonus = config.streak_bonus_max if config.streak_bonus_enabled else 0
+        return (
+            self._scorer(
+                distance=round(self._distance_score(distance_km), 1),
+                **factors
+            )
+            + max(0, max_bonus)
+            + SCORE_ROUNDING_SLACK
+        )
+    
     def _get_courier_history(self, courier: User) -> Dict[str, int]:
         """Get delivery history stats for a courier (cached)."""
-        cache_key = f"courier_history_{courier.id}"
-        cached = cache.get(cache_key)
+        return self._bulk_get_history_cached([courier.id])[str(courier.id)]
+    
+    def _bulk_get_history_cached(self, courier_ids: List) -> Dict[str, Dict[str, int]]:
+        """
+        Get delivery history stats for several couriers (cached).
         
-        if cached:
-            return cached
+        One cache.get_many for all couriers, then a single grouped
+        aggregation for the cache misses, stored back with cache.set_many.
         
-        # Query delivery history for last 30 days
-        stats = Delivery.objects.filter(
-            courier=courier,
+        Returns:
+            Dict of courier_id (str) -> history stats
+        """
+        if not courier_ids:
+            return {}
+        
+        keys = {str(courier_id): f"courier_history_{courier_id}" for courier_id in courier_ids}
+        cached = cache.get_many(list(keys.values()))
+        
+        result = {}
+        missing = []
+        for courier_id, cache_key in keys.items():
+            if cache_key in cached:
+                result[courier_id] = cached[cache_key]
+            else:
+                missing.append(courier_id)
+        
+        if not missing:
+            return result
+        
+        # Query delivery history for last 30 days, grouped by courier
+        rows = Delivery.objects.filter(
+            courier_id__in=missing,
             created_at__gte=timezone.now() - timedelta(days=30)
-        ).aggregate(
+        ).values('courier_id').annotate(
             total=Count('id'),
             completed=Count('id', filter=Q(status=DeliveryStatus.COMPLETED)),
             cancelled=Count('id', filter=Q(status=DeliveryStatus.CANCELLED)),
             failed=Count('id', filter=Q(status=DeliveryStatus.FAILED)),
         )
+        stats_by_courier = {str(row['courier_id']): row for row in rows}
+        
+        to_cache = {}
+        for courier_id in missing:
+            stats = stats_by_courier.get(courier_id, {})
+            history = {
+                'total_deliveries': stats.get('total') or 0,
+                'completed': stats.get('completed') or 0,
+                'cancelled': stats.get('cancelled') or 0,
+                'failed': stats.get('failed') or 0,
+            }
+            result[courier_id] = history
+            to_cache[keys[courier_id]] = history
         
-        result = {
-            'total_deliveries': stats['total'] or 0,
-            'completed': stats['completed'] or 0,
-            'cancelled': stats['cancelled'] or 0,
-            'failed': stats['failed'] or 0,
-        }
-        
-        cache.set(cache_key, result, self.config.courier_stats_cache_ttl)
+        cache.set_many(to_cache, self.config.courier_stats_cache_ttl)
         return result
     
     def _get_last_completion_time(self, courier: User):
-        """Get timestamp of last completed delivery."""
-        cache_key = f"courier_last_completed_{courier.id}"
-        cached = cache.get(cache_key)
-        
-        if cached is not None:
-            return cached if cached != 'NONE' else None
+        """
+        Get timestamp of last completed delivery.
         
-        try:
-            last_delivery = Delivery.objects.filter(
-                courier=courier,
-                status=DeliveryStatus.COMPLETED,
-                completed_at__isnull=False
-            ).order_by('-completed_at').values_list('completed_at', flat=True).first()
-            
-            cache.set(
-                cache_key,
-                last_delivery if last_delivery else 'NONE',
-                120  # Cache 2 min
-            )
-            return last_delivery
-        except Exception:
-            return None
+        Denormalized on the User row (set on completion by the
+        delivery signal), so no extra query is needed.
+        """
+        return courier.last_completed_delivery_at
 
 
 # ============================================
@@ -560,7 +718,13 @@ def _broadcast_to_couriers(
     scored_couriers: List[CourierScore],
     delivery: Delivery
 ):
-    """Broadcast new order to connected couriers via WebSocket."""
+    """
+    Broadcast new order to connected couriers via WebSocket.
+    
+    Each scored courier receives exactly one personalized message.
+    The city-wide broadcast is only a fallback when nobody was scored,
+    otherwise listening couriers would hear about the same order twice.
+    """
     from channels.layers import get_channel_layer
     from asgiref.sync import async_to_sync
     
@@ -568,7 +732,7 @@ def _broadcast_to_couriers(
     if not channel_layer:
         return
     
-    # Broadcast to all couriers in the dispatch zone
+    group_send = async_to_sync(channel_layer.group_send)
     city = 'DOUALA'  # TODO: Determine from delivery location
     
     event = {
@@ -581,19 +745,25 @@ def _broadcast_to_couriers(
         'courier_earning': str(delivery.courier_earning),
     }
     
-    async_to_sync(channel_layer.group_send)(f'dispatch_{city}', event)
+    if not scored_couriers:
+        # Nobody scored: fall back to all couriers in the dispatch zone
+        group_send(f'dispatch_{city}', event)
+        return
     
-    # Also send directly to scored couriers with their personalized score
+    # Send directly to scored couriers with their personalized score
+    sent_ids = set()
     for score in scored_couriers:
+        courier_id = score.courier.id
+        if courier_id in sent_ids:
+            continue
+        sent_ids.add(courier_id)
+        
         personalized_event = {
             **event,
             'your_score': round(score.total_with_bonuses, 1),
             'distance_to_pickup': round(score.distance_km, 2),
         }
-        async_to_sync(channel_layer.group_send)(
-            f'courier_{score.courier.id}',
-            personalized_event
-        )
+        group_send(f'courier_{courier_id}', personalized_event)
 
 
 # ============================================
@@ -619,7 +789,6 @@ def get_courier_score(courier_id: str, pickup_point: Point) -> Optional[CourierS
 def invalidate_courier_cache(courier_id: str):
     """Invalidate cached stats for a courier."""
     cache.delete(f"courier_history_{courier_id}")
-    cache.delete(f"courier_last_completed_{courier_id}")
 
 
 def get_dispatch_config_summary() -> Dict[str, Any]:
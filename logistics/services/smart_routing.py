@@ -22,10 +22,19 @@ Architecture:
 
 import math
 import logging
+import operator
+import orjson
 import requests
-from typing import List, Tuple, Optional, Dict
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Tuple, Optional, Dict, Sequence
 from dataclasses import dataclass, asdict, field
 
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
 from .traffic_service import TrafficService, TrafficLevel, CELL_SIZE_DEG
@@ -39,6 +48,31 @@ logger = logging.getLogger(__name__)
 # OSRM public server (free, supports Cameroon)
 OSRM_BASE_URL = 'http://router.project-osrm.org'
 
+def _build_osrm_session() -> requests.Session:
+    """HTTP session with a keep-alive connection pool for OSRM calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=32,
+        max_retries=Retry(total=1, backoff_factor=0.1),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+# Shared by all requests of the process so OSRM sockets are reused
+_OSRM_SESSION = _build_osrm_session()
+
+# Maximum distance (meters) OSRM searches for a road to snap each point to
+OSRM_SNAP_RADIUS_M = 500
+
+# OSRM responses are cached per (origin, destination) rounded to this
+# many decimals (4 ≈ 11 m), for OSRM_CACHE_TTL seconds
+OSRM_CACHE_PRECISION = 4
+OSRM_CACHE_TTL = 90
+
 # Penalty weights for route scoring
 PENALTY_DENSE = 3.0       # Dense traffic cell penalty (minutes)
 PENALTY_BLOQUE = 8.0      # Blocked cell penalty (minutes)
@@ -63,9 +97,73 @@ EVENT_PENALTIES = {
     'OTHER': 1.0,
 }
 
+# Event severity → penalty multiplier
+EVENT_SEVERITY_MULTIPLIERS = {
+    'LOW': 0.5, 'MEDIUM': 1.0,
+    'HIGH': 1.5, 'CRITICAL': 2.0,
+}
+
+# Event type → emoji shown in route warnings
+EVENT_EMOJIS = {
+    'ACCIDENT': '🚗', 'POLICE': '👮',
+    'ROAD_CLOSED': '🚧', 'FLOODING': '🌊',
+    'POTHOLE': '🕳️', 'TRAFFIC_JAM': '🚦',
+    'ROADWORK': '🏗️', 'HAZARD': '⚠️',
+}
+
+
+def _event_label(event_type: str) -> str:
+    """Warning label for an event type, e.g. '🚧 Road Closed'."""
+    emoji = EVENT_EMOJIS.get(event_type, '📍')
+    return f"{emoji} {event_type.replace('_', ' ').title()}"
+
+
+# Labels of the known event types, built once
+_EVENT_LABELS = {event_type: _event_label(event_type) for event_type in EVENT_PENALTIES}
+
+# (minimum penalty in minutes, warning severity), highest first
+_SEVERITY_THRESHOLDS = ((10, 'danger'), (3, 'warning'), (float('-inf'), 'info'))
+
 # Maximum distance (meters) to consider an event as affecting a route
 EVENT_PROXIMITY_METERS = 300
 
+# Active traffic events are shared across requests for this long (seconds)
+ACTIVE_EVENTS_CACHE_KEY = 'traffic:active_events'
+ACTIVE_EVENTS_CACHE_TTL = 30
+
+# Below this many sampled points, event proximity uses a brute-force scan
+# (building the grid index costs more than it saves)
+SPATIAL_INDEX_MIN_POINTS = 32
+
+# Mean Earth radius (meters) for haversine distances
+EARTH_RADIUS_M = 6371000
+
+# Degrees → half-angle radians (haversine works on half angles)
+HALF_DEG_TO_RAD = math.pi / 360
+
+# Meters per degree of latitude
+METERS_PER_DEG_LAT = 111000
+
+# Alternatives sharing more than this fraction of their traffic cells
+# with a better-ranked OSRM route are not scored
+ROUTE_MAX_OVERLAP = 0.7
+
+# Routes crossing at least this many cells are scored coarse-to-fine:
+# every COARSE_SAMPLING_STEP-th cell first (~1 km), then only the cells
+# around congested coarse samples
+ADAPTIVE_SAMPLING_MIN_CELLS = 25
+COARSE_SAMPLING_STEP = 5
+
+# METIS-style ranking (settings.USE_METIS_RANKING):
+#   score = METIS_ENDPOINT_WEIGHT / C_r + METIS_PENALTY_WEIGHT · total_penalty
+# C_r is approximated by the mean cell speed along the route (km/h);
+# cells without traffic data are assumed to run at METIS_DEFAULT_SPEED_KMH.
+# Source and destination are shared by all alternatives, so K_source·K_end
+# collapses into a single constant.
+METIS_ENDPOINT_WEIGHT = 100.0
+METIS_PENALTY_WEIGHT = 1.0
+METIS_DEFAULT_SPEED_KMH = 30.0
+
 # Number of waypoints to inject for nav app deep linking
 MAX_WAYPOINTS_FOR_NAV = 5
 
@@ -77,7 +175,7 @@ MIN_WAYPOINT_SPACING = 500
 # DATA CLASSES
 # ============================================
 
-@dataclass
+@dataclass(slots=True)
 class RouteSegment:
     """A segment of a route with traffic info."""
     lat: float
@@ -87,7 +185,7 @@ class RouteSegment:
     cell_id: str
 
 
-@dataclass
+@dataclass(slots=True)
 class TrafficWarning:
     """An alert about a traffic condition on the route."""
     type: str          # 'congestion', 'event', 'closure'
@@ -98,7 +196,7 @@ class TrafficWarning:
     penalty_minutes: float
 
 
-@dataclass
+@dataclass(slots=True)
 class SmartRoute:
     """Optimized route result."""
     # Route geometry (list of [lat, lng])
@@ -175,22 +273,43 @@ class SmartRoutingService:
                     dest_lat, dest_lng,
                 )
             
-            # Step 2-3: Score each route
-            scored_routes = []
-            for i, route in enumerate(osrm_routes):
-                scored = cls._score_route(route, avoid_events)
+            # Walk each polyline once; drop near-duplicate alternatives
+            for route in osrm_routes:
+                cls._prepare_route(route)
+            candidates = cls._diverse_route_indices(osrm_routes)
+            
+            # Active events are loaded once and shared by all alternatives
+            active_events = cls._load_active_events() if avoid_events else []
+            
+            # Step 2-3: Score each route (I/O-bound on Redis: run the
+            # alternatives concurrently)
+            def score(i):
+                scored = cls._score_route(osrm_routes[i], active_events)
                 scored['index'] = i
-                scored_routes.append(scored)
+                return scored
+            
+            if len(candidates) > 1:
+                with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+                    scored_routes = list(executor.map(score, candidates))
+            else:
+                scored_routes = [score(candidates[0])]
             
-            # Step 4: Pick the best route (lowest total penalty)
-            scored_routes.sort(key=lambda r: r['total_penalty'])
+            # Step 4: Pick the best route (lowest total penalty, or
+            # capacity-weighted METIS score when enabled)
+            if getattr(settings, 'USE_METIS_RANKING', False):
+                scored_routes.sort(key=lambda r: r['metis_score'])
+            else:
+                scored_routes.sort(key=lambda r: r['total_penalty'])
             best = scored_routes[0]
             best_route = osrm_routes[best['index']]
             
-            # Step 5: Generate strategic waypoints
+            # Step 5: Generate strategic waypoints (reusing the segment
+            # lengths measured while scoring)
             waypoints = cls._generate_smart_waypoints(
-                best_route['coordinates'],
+                best_route['lats'],
+                best_route['lngs'],
                 best.get('avoid_zones', []),
+                segment_lengths=best['segment_lengths'],
             )
             
             # Step 6: Build deep links
@@ -222,7 +341,9 @@ class SmartRoutingService:
                 })
             
             return SmartRoute(
-                coordinates=best_route['coordinates'],
+                # Geometry is only materialized as [lat, lng] pairs for the
+                # route returned to the client
+                coordinates=[list(point) for point in zip(best_route['lats'], best_route['lngs'])],
                 waypoints=waypoints,
                 distance_km=round(best_route['distance_m'] / 1000, 1),
                 base_eta_minutes=round(best_route['duration_s'] / 60, 1),
@@ -259,54 +380,119 @@ class SmartRoutingService:
         dest_lng: float,
     ) -> List[Dict]:
         """
-        Fetch route(s) from OSRM.
+        Fetch route(s) from OSRM, cached by quantized coordinates.
+        
+        Coordinates are rounded to OSRM_CACHE_PRECISION decimals (~11 m)
+        so repeated requests for the same trip share one OSRM call.
+        Empty results (OSRM errors) are not cached.
+        """
+        cache_key = cls._osrm_cache_key(origin_lat, origin_lng, dest_lat, dest_lng)
+        
+        routes = cache.get(cache_key)
+        if routes is None:
+            routes = cls._request_osrm_routes(
+                origin_lat, origin_lng,
+                dest_lat, dest_lng,
+            )
+            if routes:
+                cache.set(cache_key, routes, OSRM_CACHE_TTL)
+        
+        return routes
+    
+    @staticmethod
+    def _osrm_cache_key(
+        origin_lat: float,
+        origin_lng: float,
+        dest_lat: float,
+        dest_lng: float,
+    ) -> str:
+        """Cache key of an OSRM trip, quantized to OSRM_CACHE_PRECISION."""
+        p = OSRM_CACHE_PRECISION
+        return (
+            f"osrm:v2:{round(origin_lat, p)},{round(origin_lng, p)}:"
+            f"{round(dest_lat, p)},{round(dest_lng, p)}"
+        )
+    
+    @staticmethod
+    def _osrm_request(
+        origin_lat: float,
+        origin_lng: float,
+        dest_lat: float,
+        dest_lng: float,
+    ) -> Tuple[str, Dict]:
+        """
+        URL and query params of an OSRM route request.
         
         Note: OSRM uses lng,lat order (GeoJSON convention).
-        Returns up to 3 alternatives.
         """
         # OSRM format: /route/v1/driving/lng1,lat1;lng2,lat2
         coords = f"{origin_lng},{origin_lat};{dest_lng},{dest_lat}"
         url = f"{OSRM_BASE_URL}/route/v1/driving/{coords}"
         
+        # Only geometry, distance and duration are used: a simplified
+        # overview is finer than our 200 m sampling, and per-segment
+        # annotations would only inflate the payload.
         params = {
-            'overview': 'full',          # Full route geometry
+            'overview': 'simplified',    # Simplified route geometry
             'geometries': 'geojson',     # GeoJSON format
             'alternatives': 'true',      # Get alternative routes
             'steps': 'false',            # No turn-by-turn (we don't need it)
-            'annotations': 'duration,distance',  # Segment annotations
+            'radiuses': f"{OSRM_SNAP_RADIUS_M};{OSRM_SNAP_RADIUS_M}",  # Bound road snapping
         }
+        return url, params
+    
+    @staticmethod
+    def _parse_osrm_response(data: Dict) -> List[Dict]:
+        """Convert an OSRM /route response into our route dicts."""
+        if data.get('code') != 'Ok':
+            logger.warning(f"[OSRM] Error: {data.get('message', 'Unknown')}")
+            return []
         
-        try:
-            response = requests.get(url, params=params, timeout=20)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('code') != 'Ok':
-                logger.warning(f"[OSRM] Error: {data.get('message', 'Unknown')}")
-                return []
+        routes = []
+        for route in data.get('routes', []):
+            geometry = route.get('geometry', {})
+            coords_list = geometry.get('coordinates', [])
             
-            routes = []
-            for route in data.get('routes', []):
-                geometry = route.get('geometry', {})
-                coords_list = geometry.get('coordinates', [])
-                
-                # OSRM returns [lng, lat] → convert to [lat, lng]
-                coordinates = [[c[1], c[0]] for c in coords_list]
-                
-                routes.append({
-                    'coordinates': coordinates,
-                    'distance_m': route.get('distance', 0),
-                    'duration_s': route.get('duration', 0),
-                })
+            # OSRM returns [lng, lat] pairs → split into parallel
+            # lats/lngs sequences
+            lngs, lats = zip(*coords_list) if coords_list else ((), ())
             
+            routes.append({
+                'lats': lats,
+                'lngs': lngs,
+                'distance_m': route.get('distance', 0),
+                'duration_s': route.get('duration', 0),
+            })
+        
+        if routes:
             logger.info(
                 f"[OSRM] Got {len(routes)} route(s), "
                 f"best: {routes[0]['distance_m']/1000:.1f}km / "
                 f"{routes[0]['duration_s']/60:.0f}min"
             )
-            return routes
+        return routes
+    
+    @classmethod
+    def _request_osrm_routes(
+        cls,
+        origin_lat: float,
+        origin_lng: float,
+        dest_lat: float,
+        dest_lng: float,
+    ) -> List[Dict]:
+        """
+        Request route(s) from OSRM.
+        
+        Returns up to 3 alternatives.
+        """
+        url, params = cls._osrm_request(origin_lat, origin_lng, dest_lat, dest_lng)
+        
+        try:
+            response = _OSRM_SESSION.get(url, params=params, timeout=20)
+            response.raise_for_status()
+            return cls._parse_osrm_response(orjson.loads(response.content))
             
-        except requests.RequestException as e:
+        except (requests.RequestException, ValueError) as e:
             logger.error(f"[OSRM] Request failed: {e}")
             return []
     
@@ -315,18 +501,136 @@ class SmartRoutingService:
     # ==========================================
     
     @classmethod
-    def _score_route(cls, route: Dict, check_events: bool) -> Dict:
+    def _load_active_events(cls) -> List[Tuple[float, float, str, str, str]]:
+        """
+        Fetch currently active traffic events as lightweight tuples.
+        
+        Returns (lat, lng, event_type, severity, address) tuples, cached
+        for ACTIVE_EVENTS_CACHE_TTL seconds since events change slowly.
+        """
+        def load():
+            from logistics.models import TrafficEvent
+            
+            rows = TrafficEvent.objects.filter(
+                is_active=True,
+                expires_at__gt=timezone.now(),
+            ).values_list('event_type', 'severity', 'address', 'location')
+            
+            return [
+                (location.y, location.x, event_type, severity, address or '')
+                for event_type, severity, address, location in rows
+            ]
+        
+        return cache.get_or_set(ACTIVE_EVENTS_CACHE_KEY, load, ACTIVE_EVENTS_CACHE_TTL)
+    
+    @classmethod
+    def _prepare_route(cls, route: Dict) -> Dict:
+        """
+        Attach the polyline walk to a route dict (once).
+        
+        Adds 'sampled' (points every ~200 m = every cell),
+        'segment_lengths' and 'cells' (cell_id → first sampled point in
+        that cell, in route order).
+        """
+        if 'cells' in route:
+            return route
+        
+        sampled, segment_lengths = cls._walk_route(
+            route['lats'], route['lngs'], interval_m=200
+        )
+        
+        cells = {}
+        for lat, lng in sampled:
+            cell_id = TrafficService.latlng_to_cell(lat, lng)
+            if cell_id is not None and cell_id not in cells:
+                cells[cell_id] = (lat, lng)
+        
+        route['sampled'] = sampled
+        route['segment_lengths'] = segment_lengths
+        route['cells'] = cells
+        return route
+    
+    @staticmethod
+    def _diverse_route_indices(routes: List[Dict]) -> List[int]:
+        """
+        Indices of the routes worth scoring, in OSRM order.
+        
+        OSRM alternatives are often near-duplicates of each other. A
+        route sharing more than ROUTE_MAX_OVERLAP of its cells with an
+        already kept route is dropped (the "share more than X percent"
+        penalty-method heuristic). Routes without any known cell are
+        always kept.
+        """
+        kept = []
+        kept_cells = []
+        for i, route in enumerate(routes):
+            cells = set(route['cells'])
+            if cells and any(
+                len(cells & other) / len(cells) > ROUTE_MAX_OVERLAP
+                for other in kept_cells
+            ):
+                continue
+            kept.append(i)
+            kept_cells.append(cells)
+        return kept
+    
+    @staticmethod
+    def _fetch_cells_adaptive(cell_ids: List[int]) -> Dict:
+        """
+        Fetch traffic for the cells of a long route, coarse-to-fine.
+        
+        Every COARSE_SAMPLING_STEP-th cell (~1 km) is fetched first. Only
+        the cells surrounding a coarse cell that is not fluid are then
+        fetched. Stretches whose coarse samples are fluid (or unknown) are
+        treated as clear, which is the common case.
+        
+        Args:
+            cell_ids: Packed cells in route order
+        
+        Returns:
+            Dict of cell_id → TrafficCell (cells without data omitted)
+        """
+        step = COARSE_SAMPLING_STEP
+        count = len(cell_ids)
+        cells_traffic = TrafficService.get_cells_traffic(cell_ids[::step])
+        
+        fine_ids = []
+        for i in range(0, count, step):
+            cell = cells_traffic.get(cell_ids[i])
+            if cell is None or cell.level == TrafficLevel.FLUIDE:
+                continue
+            # Neighbours up to (but excluding) the adjacent coarse samples
+            fine_ids.extend(
+                cell_ids[j]
+                for j in range(max(0, i - step + 1), min(count, i + step))
+                if j % step
+            )
+        
+        if fine_ids:
+            cells_traffic.update(
+                TrafficService.get_cells_traffic(list(dict.fromkeys(fine_ids)))
+            )
+        
+        return cells_traffic
+    
+    @classmethod
+    def _score_route(cls, route: Dict, active_events: List) -> Dict:
         """
         Score a route based on traffic heatmap + active events.
         
+        active_events is the pre-fetched list from _load_active_events()
+        (empty to ignore events); it is shared across alternatives and
+        must not trigger DB access here since routes are scored in
+        worker threads.
+        
         Returns dict with:
         - total_penalty: total time penalty in minutes
         - traffic_score: 0-100 congestion score
         - congested_count: number of congested segments
         - warnings: list of warnings
         - avoid_zones: list of zones to avoid
+        - segment_lengths: polyline segment lengths (for waypoints)
         """
-        coordinates = route['coordinates']
         total_penalty = 0.0
         congested_count = 0
         total_segments = 0
@@ -334,23 +638,31 @@ class SmartRoutingService:
         avoid_zones = []
         
         # Sample coordinates along the route (every ~200m = every cell)
-        sampled = cls._sample_coordinates(coordinates, interval_m=200)
+        cls._prepare_route(route)
+        sampled = route['sampled']
+        segment_lengths = route['segment_lengths']
+        sampled_cells = route['cells']
         total_segments = len(sampled)
         
-        # Check each sampled point against traffic heatmap
-        checked_cells = set()
-        for lat, lng in sampled:
-            cell_id = TrafficService.latlng_to_cell(lat, lng)
-            
-            if cell_id in checked_cells:
-                continue
-            checked_cells.add(cell_id)
-            
-            cell_data = TrafficService.get_cell_traffic(cell_id)
+        # One Redis round-trip for all cells on short routes; coarse then
+        # fine (around congestion) on long ones
+        cell_ids = list(sampled_cells)
+        if len(cell_ids) >= ADAPTIVE_SAMPLING_MIN_CELLS:
+            cells_traffic = cls._fetch_cells_adaptive(cell_ids)
+        else:
+            cells_traffic = TrafficService.get_cells_traffic(cell_ids)
+        
+        # Capacity proxy: sum of cell speeds (unknown cells at default speed)
+        speed_sum = METIS_DEFAULT_SPEED_KMH * (len(sampled_cells) - len(cells_traffic))
+        
+        # Check each sampled cell against traffic heatmap
+        for cell_id, (lat, lng) in sampled_cells.items():
+            cell_data = cells_traffic.get(cell_id)
             if not cell_data:
                 continue
             
-            level = cell_data.get('level', TrafficLevel.UNKNOWN)
+            speed_sum += cell_data.avg_speed_kmh
+            level = cell_data.level
             
             if level == TrafficLevel.DENSE:
                 total_penalty += PENALTY_DENSE
@@ -363,7 +675,7 @@ class SmartRoutingService:
                 warnings.append({
                     'type': 'congestion',
                     'severity': 'danger',
-                    'message': f"🔴 Trafic bloqué ({cell_data.get('avg_speed_kmh', 0):.0f} km/h)",
+                    'message': f"🔴 Trafic bloqué ({cell_data.avg_speed_kmh:.0f} km/h)",
                     'latitude': lat,
                     'longitude': lng,
                     'penalty_minutes': PENALTY_BLOQUE,
@@ -373,42 +685,37 @@ class SmartRoutingService:
                 total_penalty += PENALTY_MODERE
         
         # Check active traffic events
-        if check_events:
-            from logistics.models import TrafficEvent
+        if active_events:
+            # Check every 3rd point for speed; radians/cos converted once
+            # per route instead of once per (event, point) pair.
+            check_points = sampled[::3]
+            route_points = cls._to_radian_points(check_points)
             
-            active_events = TrafficEvent.objects.filter(
-                is_active=True,
-                expires_at__gt=timezone.now(),
-            ).only('id', 'event_type', 'severity', 'location', 'address')
+            # On long routes, bucket points in a grid so each event only
+            # measures distance to the points in its neighbouring cells.
+            point_grid = None
+            if len(route_points) >= SPATIAL_INDEX_MIN_POINTS:
+                point_grid = cls._build_point_grid(check_points, route_points)
+            
+            # Route envelope buffered by the proximity radius: events
+            # outside it cannot be near the route.
+            envelope = cls._buffered_envelope(check_points, route_points)
             
-            for event in active_events:
-                # Extract lat/lng from PointField
-                event_lat = event.location.y
-                event_lng = event.location.x
+            for event_lat, event_lng, event_type, event_severity, address in active_events:
+                if not cls._in_envelope(envelope, event_lat, event_lng):
+                    continue
                 
                 # Check if event is near the route
-                min_dist = float('inf')
-                closest_point = None
-                
-                for lat, lng in sampled[::3]:  # Check every 3rd point for speed
-                    dist = cls._haversine_m(
-                        lat, lng,
-                        event_lat,
-                        event_lng,
-                    )
-                    if dist < min_dist:
-                        min_dist = dist
-                        closest_point = (lat, lng)
+                candidates = route_points
+                if point_grid is not None:
+                    candidates = cls._grid_candidates(point_grid, event_lat, event_lng)
+                min_dist, _ = cls._nearest_point_m(candidates, event_lat, event_lng)
                 
                 if min_dist <= EVENT_PROXIMITY_METERS:
-                    event_type = event.event_type
                     penalty = EVENT_PENALTIES.get(event_type, 1.0)
                     
                     # Scale penalty by severity
-                    severity_multiplier = {
-                        'LOW': 0.5, 'MEDIUM': 1.0,
-                        'HIGH': 1.5, 'CRITICAL': 2.0,
-                    }.get(event.severity, 1.0)
+                    severity_multiplier = EVENT_SEVERITY_MULTIPLIERS.get(event_severity, 1.0)
                     
                     actual_penalty = penalty * severity_multiplier
                     total_penalty += actual_penalty
@@ -417,25 +724,17 @@ class SmartRoutingService:
                     if event_type == 'ROAD_CLOSED':
                         avoid_zones.append([event_lat, event_lng])
                     
-                    # Map event type to emoji
-                    event_emojis = {
-                        'ACCIDENT': '🚗', 'POLICE': '👮',
-                        'ROAD_CLOSED': '🚧', 'FLOODING': '🌊',
-                        'POTHOLE': '🕳️', 'TRAFFIC_JAM': '🚦',
-                        'ROADWORK': '🏗️', 'HAZARD': '⚠️',
-                    }
-                    warn_severity = 'danger' if actual_penalty >= 10 else (
-                        'warning' if actual_penalty >= 3 else 'info'
+                    warn_severity = next(
+                        severity for threshold, severity in _SEVERITY_THRESHOLDS
+                        if actual_penalty >= threshold
                     )
                     
-                    emoji = event_emojis.get(event_type, '📍')
-                    address = event.address or ''
+                    label = _EVENT_LABELS.get(event_type) or _event_label(event_type)
                     
                     warnings.append({
                         'type': 'event',
                         'severity': warn_severity,
-                        'message': f"{emoji} {event_type.replace('_', ' ').title()}"
-                                   f"{f' — {address}' if address else ''}",
+                        'message': f"{label} — {address}" if address else label,
                         'latitude': event_lat,
                         'longitude': event_lng,
                         'penalty_minutes': actual_penalty,
@@ -447,44 +746,75 @@ class SmartRoutingService:
         else:
             traffic_score = 0
         
+        # METIS score: capacity term + weighted penalty
+        capacity = speed_sum / len(sampled_cells) if sampled_cells else METIS_DEFAULT_SPEED_KMH
+        metis_score = (
+            METIS_ENDPOINT_WEIGHT / max(capacity, 1.0)
+            + METIS_PENALTY_WEIGHT * total_penalty
+        )
+        
         return {
             'total_penalty': total_penalty,
+            'metis_score': metis_score,
             'traffic_score': round(traffic_score, 1),
             'congested_count': congested_count,
             'total_segments': total_segments,
             'warnings': warnings,
             'avoid_zones': avoid_zones,
+            'segment_lengths': segment_lengths,
         }
     
-    @classmethod
-    def _sample_coordinates(
-        cls,
-        coordinates: List[List[float]],
+    @staticmethod
+    def _walk_route(
+        lats: Sequence[float],
+        lngs: Sequence[float],
         interval_m: float = 200,
-    ) -> List[Tuple[float, float]]:
-        """Sample coordinates along a route at regular intervals."""
-        if not coordinates:
-            return []
+    ) -> Tuple[List[Tuple[float, float]], List[float]]:
+        """
+        Walk the polyline once, sampling it and measuring its segments.
         
-        sampled = [tuple(coordinates[0])]
-        accumulated_dist = 0.0
+        Returns (sampled, segment_lengths): points every ~interval_m
+        (first and last always included) and the haversine length of
+        each consecutive segment, so waypoint generation does not need
+        to walk the polyline again.
+        """
+        if not lats:
+            return [], []
+        
+        # Per-vertex trig is pushed into C via map() over whole sequences;
+        # only the final combination and the sampling run as bytecode.
+        sin = math.sin
+        asin = math.asin
+        sqrt = math.sqrt
+        
+        half_lats = [lat * HALF_DEG_TO_RAD for lat in lats]
+        half_lngs = [lng * HALF_DEG_TO_RAD for lng in lngs]
+        cos_lats = list(map(math.cos, map(operator.add, half_lats, half_lats)))
+        
+        sin_dlats = map(sin, map(operator.sub, half_lats[1:], half_lats))
+        sin_dlngs = map(sin, map(operator.sub, half_lngs[1:], half_lngs))
+        cos_products = map(operator.mul, cos_lats, cos_lats[1:])
+        
+        diameter = 2 * EARTH_RADIUS_M
+        segment_lengths = [
+            diameter * asin(sqrt(min(1.0, s_lat * s_lat + cos_product * s_lng * s_lng)))
+            for s_lat, s_lng, cos_product in zip(sin_dlats, sin_dlngs, cos_products)
+        ]
         
-        for i in range(1, len(coordinates)):
-            prev = coordinates[i - 1]
-            curr = coordinates[i]
-            dist = cls._haversine_m(prev[0], prev[1], curr[0], curr[1])
+        sampled = [(lats[0], lngs[0])]
+        accumulated_dist = 0.0
+        for i, dist in enumerate(segment_lengths, 1):
             accumulated_dist += dist
-            
             if accumulated_dist >= interval_m:
-                sampled.append(tuple(curr))
+                sampled.append((lats[i], lngs[i]))
                 accumulated_dist = 0.0
         
         # Always include the last point
-        last = tuple(coordinates[-1])
+        last = (lats[-1], lngs[-1])
         if sampled[-1] != last:
             sampled.append(last)
         
-        return sampled
+        return sampled, segment_lengths
     
     # ==========================================
     # WAYPOINT GENERATION
@@ -493,8 +823,10 @@ class SmartRoutingService:
     @classmethod
     def _generate_smart_waypoints(
         cls,
-        coordinates: List[List[float]],
+        lats: Sequence[float],
+        lngs: Sequence[float],
         avoid_zones: List[List[float]],
+        segment_lengths: Optional[List[float]] = None,
     ) -> List[List[float]]:
         """
         Generate strategic waypoints for nav app deep linking.
@@ -507,16 +839,14 @@ class SmartRoutingService:
         - Add extra waypoints near avoid zones (to route around them)
         - Max 5 waypoints (Google Maps limit for free)
         """
-        if len(coordinates) < 3:
+        if len(lats) < 3:
             return []
         
-        # Calculate total route length
-        total_dist = 0.0
-        for i in range(1, len(coordinates)):
-            total_dist += cls._haversine_m(
-                coordinates[i-1][0], coordinates[i-1][1],
-                coordinates[i][0], coordinates[i][1],
-            )
+        # Cumulative distance at each vertex after the first
+        if segment_lengths is None:
+            segment_lengths = cls._walk_route(lats, lngs)[1]
+        cumulative = list(accumulate(segment_lengths))
+        total_dist = cumulative[-1]
         
         if total_dist < 500:
             # Short route, no waypoints needed
@@ -526,22 +856,13 @@ class SmartRoutingService:
         target_count = min(MAX_WAYPOINTS_FOR_NAV, max(2, int(total_dist / 1000)))
         interval = total_dist / (target_count + 1)
         
-        waypoints = []
-        accumulated = 0.0
-        wp_count = 0
+        # First vertex at or past each target distance (binary search)
+        indices = sorted({
+            bisect_left(cumulative, interval * k) + 1
+            for k in range(1, target_count + 1)
+        })
         
-        for i in range(1, len(coordinates)):
-            prev = coordinates[i - 1]
-            curr = coordinates[i]
-            seg_dist = cls._haversine_m(prev[0], prev[1], curr[0], curr[1])
-            accumulated += seg_dist
-            
-            if accumulated >= interval and wp_count < target_count:
-                waypoints.append([round(curr[0], 6), round(curr[1], 6)])
-                accumulated = 0.0
-                wp_count += 1
-        
-        return waypoints
+        return [[round(lats[i], 6), round(lngs[i], 6)] for i in indices]
     
     # ==========================================
     # DEEP LINKS
@@ -564,14 +885,15 @@ class SmartRoutingService:
         google.navigation:q=lat,lng (single destination, no waypoints)
         comgooglemaps://?saddr=&daddr=wp1+to:wp2+to:dest
         """
-        # Web URL format (works on both mobile and desktop)
-        parts = [f"{origin_lat},{origin_lng}"]
-        for wp in waypoints:
-            parts.append(f"{wp[0]},{wp[1]}")
-        parts.append(f"{dest_lat},{dest_lng}")
+        # Web URL format (works on both mobile and desktop), 6 decimals
+        # (~0.1 m) like the waypoints themselves
+        dest = '%.6f,%.6f' % (dest_lat, dest_lng)
+        parts = ['%.6f,%.6f' % (origin_lat, origin_lng)]
+        parts.extend(['%.6f,%.6f' % (wp[0], wp[1]) for wp in waypoints])
+        parts.append(dest)
         
         path = '/'.join(parts)
-        return f"https://www.google.com/maps/dir/{path}/@{dest_lat},{dest_lng},14z/data=!4m2!4m1!3e0"
+        return f"https://www.google.com/maps/dir/{path}/@{dest},14z/data=!4m2!4m1!3e0"
     
     @classmethod
     def _build_waze_url(cls, dest_lat: float, dest_lng: float) -> str:
@@ -651,16 +973,144 @@ class SmartRoutingService:
     # HELPERS
     # ==========================================
     
+    @staticmethod
+    def _to_radian_points(
+        points: List[Tuple[float, float]],
+    ) -> List[Tuple[float, float, float]]:
+        """Precompute (lat_rad, lng_rad, cos(lat)) for repeated distance checks."""
+        radians = math.radians
+        cos = math.cos
+        return [
+            (radians(lat), radians(lng), cos(radians(lat)))
+            for lat, lng in points
+        ]
+    
+    @staticmethod
+    def _buffered_envelope(
+        points: List[Tuple[float, float]],
+        radian_points: List[Tuple[float, float, float]],
+    ) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Bounding box of the points grown by EVENT_PROXIMITY_METERS.
+        
+        Returns (min_lat, max_lat, min_lng, max_lng), or None if empty.
+        """
+        if not points:
+            return None
+        
+        lats = [p[0] for p in points]
+        lngs = [p[1] for p in points]
+        buffer_lat = EVENT_PROXIMITY_METERS / METERS_PER_DEG_LAT
+        min_cos = min(p[2] for p in radian_points)
+        buffer_lng = buffer_lat / max(min_cos, 0.01)
+        
+        return (
+            min(lats) - buffer_lat, max(lats) + buffer_lat,
+            min(lngs) - buffer_lng, max(lngs) + buffer_lng,
+        )
+    
+    @staticmethod
+    def _in_envelope(envelope, lat: float, lng: float) -> bool:
+        """Whether a location falls inside a buffered envelope."""
+        if envelope is None:
+            return False
+        min_lat, max_lat, min_lng, max_lng = envelope
+        return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+    
+    @staticmethod
+    def _build_point_grid(
+        points: List[Tuple[float, float]],
+        radian_points: List[Tuple[float, float, float]],
+    ) -> Dict:
+        """
+        Bucket route points in a grid of EVENT_PROXIMITY_METERS-sized cells.
+        
+        Any point within EVENT_PROXIMITY_METERS of a location lies in the
+        location's cell or one of its 8 neighbours.
+        """
+        cell_lat = EVENT_PROXIMITY_METERS / METERS_PER_DEG_LAT
+        # Longitude degrees shrink with latitude: size for the worst case
+        min_cos = min(p[2] for p in radian_points)
+        cell_lng = cell_lat / max(min_cos, 0.01)
+        
+        cells = {}
+        for (lat, lng), radian_point in zip(points, radian_points):
+            key = (int(lat // cell_lat), int(lng // cell_lng))
+            cells.setdefault(key, []).append(radian_point)
+        
+        return {'cell_lat': cell_lat, 'cell_lng': cell_lng, 'cells': cells}
+    
+    @staticmethod
+    def _grid_candidates(
+        grid: Dict,
+        lat: float,
+        lng: float,
+    ) -> List[Tuple[float, float, float]]:
+        """Route points in the 3x3 grid cells around a location."""
+        row = int(lat // grid['cell_lat'])
+        col = int(lng // grid['cell_lng'])
+        cells = grid['cells']
+        
+        candidates = []
+        for r in (row - 1, row, row + 1):
+            for c in (col - 1, col, col + 1):
+                bucket = cells.get((r, c))
+                if bucket:
+                    candidates.extend(bucket)
+        return candidates
+    
+    @staticmethod
+    def _nearest_point_m(
+        points: List[Tuple[float, float, float]],
+        lat: float,
+        lng: float,
+    ) -> Tuple[float, int]:
+        """
+        Distance in meters from (lat, lng) to the closest precomputed point.
+        
+        Returns (min_distance_m, index), or (inf, -1) for an empty list.
+        """
+        sin = math.sin
+        lat0 = math.radians(lat)
+        lng0 = math.radians(lng)
+        cos0 = math.cos(lat0)
+        
+        # Compare haversine 'a' terms: monotonic in distance, so the
+        # sqrt/atan2 only run once for the winner.
+        best_a = float('inf')
+        best_idx = -1
+        for idx, (plat, plng, pcos) in enumerate(points):
+            s_lat = sin((lat0 - plat) / 2)
+            s_lng = sin((lng0 - plng) / 2)
+            a = s_lat * s_lat + cos0 * pcos * s_lng * s_lng
+            if a < best_a:
+                best_a = a
+                best_idx = idx
+        
+        if best_idx < 0:
+            return float('inf'), -1
+        return EARTH_RADIUS_M * 2 * math.asin(math.sqrt(min(1.0, best_a))), best_idx
+    
     @staticmethod
     def _haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Distance in meters between two GPS points."""
-        R = 6371000
-        dlat = math.radians(lat2 - lat1)
-        dlng = math.radians(lng2 - lng1)
+        # Same meridian: the great-circle distance is the latitude arc
+        if lng1 == lng2:
+            return EARTH_RADIUS_M * abs(math.radians(lat2 - lat1))
+        
+        dlng_half_sin = math.sin(math.radians(lng2 - lng1) / 2)
+        
+        # Same parallel: a reduces to cos²(lat)·sin²(dlng/2)
+        if lat1 == lat2:
+            return EARTH_RADIUS_M * 2 * math.asin(
+                min(1.0, abs(math.cos(math.radians(lat1)) * dlng_half_sin))
+            )
+        
+        dlat_half_sin = math.sin(math.radians(lat2 - lat1) / 2)
         a = (
-            math.sin(dlat / 2) ** 2
+            dlat_half_sin * dlat_half_sin
             + math.cos(math.radians(lat1))
             * math.cos(math.radians(lat2))
-            * math.sin(dlng / 2) ** 2
+            * dlng_half_sin * dlng_half_sin
         )
-        return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        return EARTH_RADIUS_M * 2 * math.asin(math.sqrt(min(1.0, a)))
@@ -10,7 +10,7 @@ Architecture:
         → TrafficService.ingest_location()
             → Compute speed from consecutive GPS fixes
             → Map (lat, lng) → grid cell ID
-            → Store in Redis: traffic:cell:<cell_id>
+            → Store in Redis: traffic:obs:<cell>
             → Aggregate speeds → traffic level (FLUIDE / MODERE / DENSE / BLOQUE)
 
 Grid system:
@@ -18,12 +18,20 @@ Grid system:
     lat/lng grid. At Douala's latitude (4°N), 1° latitude ≈ 111 km
     and 1° longitude ≈ 110.7 km, so a 200m cell is approximately
     0.0018° × 0.0018°.
+    
+    Internally a cell is a packed int (row * COL_STRIDE + col); the
+    "cell_<row>_<col>" string form is only used in API responses.
 """
 
-import json
 import math
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from math import asin, cos, sin, sqrt
 import time
+import uuid
+import threading
 import logging
+import orjson
 from typing import Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
@@ -42,6 +50,9 @@ logger = logging.getLogger(__name__)
 # Grid cell size in degrees (~200m at equator/Douala latitude)
 CELL_SIZE_DEG = 0.0018
 
+# Packed cell = row * COL_STRIDE + col (must exceed the number of columns)
+COL_STRIDE = 1000
+
 # Douala bounding box (approximate)
 DOUALA_BOUNDS = {
     'min_lat': 3.95,
@@ -50,6 +61,17 @@ DOUALA_BOUNDS = {
     'max_lng': 9.85,
 }
 
+# Cell center lookup tables (a cell's center is its row's latitude and
+# its column's longitude), built once at import
+_GRID_ROWS = int((DOUALA_BOUNDS['max_lat'] - DOUALA_BOUNDS['min_lat']) / CELL_SIZE_DEG) + 1
+_GRID_COLS = int((DOUALA_BOUNDS['max_lng'] - DOUALA_BOUNDS['min_lng']) / CELL_SIZE_DEG) + 1
+_ROW_CENTER_LATS = tuple(
+    DOUALA_BOUNDS['min_lat'] + (row + 0.5) * CELL_SIZE_DEG for row in range(_GRID_ROWS)
+)
+_COL_CENTER_LNGS = tuple(
+    DOUALA_BOUNDS['min_lng'] + (col + 0.5) * CELL_SIZE_DEG for col in range(_GRID_COLS)
+)
+
 # Traffic level thresholds (km/h)
 SPEED_FLUIDE = 25       # Above this → green
 SPEED_MODERE = 15       # Above this → yellow
@@ -62,21 +84,103 @@ MIN_OBSERVATIONS = 2
 # Redis key prefix
 REDIS_PREFIX = 'traffic'
 
+# Set of cells that currently hold observations (avoids keyspace SCANs)
+ACTIVE_CELLS_KEY = f'{REDIS_PREFIX}:active_cells'
+
+# Sorted set of couriers (score = last fix timestamp)
+ONLINE_COURIERS_KEY = f'{REDIS_PREFIX}:online_couriers'
+
 # TTL for individual speed observations (10 minutes)
 OBSERVATION_TTL = 600
 
 # TTL for aggregated traffic data (5 minutes)
 AGGREGATED_TTL = 300
 
+# Cached heatmap (hash: 'all' → full list, 'row:<row>' → cells of a row)
+HEATMAP_CACHE_KEY = f'{REDIS_PREFIX}:heatmap:v2'
+
 # Maximum age of a position fix to compute speed (seconds)
 MAX_FIX_AGE = 300  # 5 minutes (needed for very slow traffic: 3km/h = 200m in 4min)
 
+# Haversine constants
+EARTH_DIAMETER_M = 2 * 6371000   # 2 × mean Earth radius
+DEG_TO_RAD = math.pi / 180
+HALF_DEG_TO_RAD = math.pi / 360
+
 # Minimum distance between fixes to compute speed (meters)
 MIN_DISTANCE = 20
 
 # Maximum realistic speed (km/h) - filter out GPS jumps
 MAX_REALISTIC_SPEED = 80
 
+# Atomically read the previous fix of a courier and store the new one.
+# KEYS[1] = fix key, KEYS[2] = online couriers set, ARGV = lat, lng, ts,
+# ttl, courier id. Also marks the courier as seen at ts. Returns the
+# previous {lat, lng, ts} (nils if none). Legacy JSON string fixes are
+# dropped.
+SWAP_FIX_SCRIPT = """
+if redis.call('TYPE', KEYS[1]).ok == 'string' then
+    redis.call('DEL', KEYS[1])
+end
+local prev = redis.call('HMGET', KEYS[1], 'lat', 'lng', 'ts')
+redis.call('HSET', KEYS[1], 'lat', ARGV[1], 'lng', ARGV[2], 'ts', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[5])
+return prev
+"""
+
+# Drop observations older than a cutoff from both sets of a cell.
+# KEYS[1] = obs key (score = timestamp), KEYS[2] = speed key (score =
+# speed), KEYS[3] = active cells set, ARGV[1] = cutoff, ARGV[2] = cell.
+# Once empty, deletes both keys and removes the cell from the active
+# set. Returns the number of observations removed.
+PRUNE_OBSERVATIONS_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if #expired > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    for i = 1, #expired, 1000 do
+        redis.call('ZREM', KEYS[2], unpack(expired, i, math.min(i + 999, #expired)))
+    end
+end
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    redis.call('SREM', KEYS[3], ARGV[2])
+end
+return #expired
+"""
+
+# Sum and count the current speeds of several cells server-side, so the
+# heatmap rebuild transfers two values per cell instead of every
+# observation. KEYS = (obs key, speed key) pairs, ARGV[1] = cutoff.
+# Returns a flat array: speed sum (string, to keep decimals), count, ...
+AGGREGATE_CELLS_SCRIPT = """
+local out = {}
+for i = 1, #KEYS, 2 do
+    local expired = {}
+    for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[i], '-inf', ARGV[1])) do
+        expired[member] = true
+    end
+    local scored = redis.call('ZRANGE', KEYS[i + 1], 0, -1, 'WITHSCORES')
+    local total, count = 0, 0
+    for j = 1, #scored, 2 do
+        if not expired[scored[j]] then
+            total = total + tonumber(scored[j + 1])
+            count = count + 1
+        end
+    end
+    out[#out + 1] = tostring(total)
+    out[#out + 1] = count
+end
+return out
+"""
+
+# Cells per AGGREGATE_CELLS_SCRIPT call / per cleanup pipeline (bounds
+# how long Redis is blocked and how large a single reply gets)
+CELL_BATCH_SIZE = 500
+
+# redis-py Script objects, registered on first use (they keep their SHA)
+_scripts = {}
+
 
 # ============================================
 # DATA CLASSES
@@ -92,7 +196,7 @@ class TrafficLevel:
     UNKNOWN = 'UNKNOWN'
 
 
-@dataclass
+@dataclass(slots=True)
 class TrafficCell:
     """Traffic data for a single grid cell."""
     cell_id: str
@@ -107,13 +211,53 @@ class TrafficCell:
         return asdict(self)
 
 
-@dataclass
-class CourierFix:
-    """A single GPS fix from a courier."""
-    courier_id: str
-    latitude: float
-    longitude: float
-    timestamp: float  # Unix timestamp
+# Speed thresholds (ascending) and the level of each interval:
+# [0, DENSE) → BLOQUE, [DENSE, MODERE) → DENSE, ... (see speed_to_level)
+_SPEED_THRESHOLDS = (SPEED_DENSE, SPEED_MODERE, SPEED_FLUIDE)
+_SPEED_LEVELS = (
+    TrafficLevel.BLOQUE,
+    TrafficLevel.DENSE,
+    TrafficLevel.MODERE,
+    TrafficLevel.FLUIDE,
+)
+
+# Traffic level → display color
+_LEVEL_COLORS = {
+    TrafficLevel.FLUIDE: '#4CAF50',   # Green
+    TrafficLevel.MODERE: '#FF9800',   # Orange
+    TrafficLevel.DENSE: '#F44336',    # Red
+    TrafficLevel.BLOQUE: '#880E4F',   # Dark Red
+    TrafficLevel.UNKNOWN: '#9E9E9E',  # Grey
+}
+
+
+def _compute_speed_kmh(lat1: float, lng1: float, t1: float,
+                       lat2: float, lng2: float, t2: float) -> Optional[float]:
+    """
+    Speed (km/h) between two GPS fixes, or None if not measurable.
+    
+    Only computed if:
+    - Time gap is reasonable (3 s to MAX_FIX_AGE: not too old, and not
+      too small to avoid division by zero noise)
+    - Distance is meaningful (at least MIN_DISTANCE)
+    
+    Haversine is inlined so a fix costs a single Python call.
+    The realistic-speed filter is left to the caller (it logs GPS jumps).
+    """
+    dt = t2 - t1
+    if not 3 <= dt <= MAX_FIX_AGE:
+        return None
+    
+    sin_dphi = sin((lat2 - lat1) * HALF_DEG_TO_RAD)
+    sin_dlambda = sin((lng2 - lng1) * HALF_DEG_TO_RAD)
+    a = (sin_dphi * sin_dphi +
+         cos(lat1 * DEG_TO_RAD) * cos(lat2 * DEG_TO_RAD) * sin_dlambda * sin_dlambda)
+    distance_m = EARTH_DIAMETER_M * asin(sqrt(min(a, 1.0)))
+    
+    if distance_m < MIN_DISTANCE:
+        return None
+    
+    return distance_m / dt * 3.6
 
 
 # ============================================
@@ -128,14 +272,19 @@ class TrafficService:
     across the city grid.
     """
     
+    # Shared Redis client, created on first use (see _get_redis)
+    _redis_client = None
+    _redis_lock = threading.Lock()
+    
     # ---- Grid Helpers ----
     
     @staticmethod
-    def latlng_to_cell(lat: float, lng: float) -> str:
+    def latlng_to_cell(lat: float, lng: float) -> Optional[int]:
         """
-        Convert a lat/lng coordinate to a grid cell ID.
+        Convert a lat/lng coordinate to a packed grid cell.
         
-        Cell ID format: "cell_<row>_<col>"
+        Cell format: row * COL_STRIDE + col (0 is a valid cell: compare
+        with None, not truthiness)
         """
         if not (DOUALA_BOUNDS['min_lat'] <= lat <= DOUALA_BOUNDS['max_lat'] and
                 DOUALA_BOUNDS['min_lng'] <= lng <= DOUALA_BOUNDS['max_lng']):
@@ -143,18 +292,56 @@ class TrafficService:
             
         row = int((lat - DOUALA_BOUNDS['min_lat']) / CELL_SIZE_DEG)
         col = int((lng - DOUALA_BOUNDS['min_lng']) / CELL_SIZE_DEG)
+        return row * COL_STRIDE + col
+    
+    @staticmethod
+    def points_to_cells(points: List[Tuple[float, float]]) -> List[int]:
+        """
+        Packed cells of many (lat, lng) points, in order.
+        
+        Batch form of latlng_to_cell: bounds and grid constants are bound
+        once, and points outside Douala are dropped.
+        """
+        min_lat = DOUALA_BOUNDS['min_lat']
+        max_lat = DOUALA_BOUNDS['max_lat']
+        min_lng = DOUALA_BOUNDS['min_lng']
+        max_lng = DOUALA_BOUNDS['max_lng']
+        cell = CELL_SIZE_DEG
+        return [
+            int((lat - min_lat) / cell) * COL_STRIDE + int((lng - min_lng) / cell)
+            for lat, lng in points
+            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        ]
+    
+    @staticmethod
+    def cell_id_str(cell: int) -> str:
+        """Public cell ID of a packed cell: "cell_<row>_<col>"."""
+        row, col = divmod(cell, COL_STRIDE)
         return f"cell_{row}_{col}"
     
     @staticmethod
-    def cell_to_center(cell_id: str) -> Tuple[float, float]:
+    def parse_cell_id(cell_id: str) -> Optional[int]:
+        """Packed cell of a public "cell_<row>_<col>" ID (None if invalid)."""
+        try:
+            _, row, col = cell_id.split('_')
+            row, col = int(row), int(col)
+        except (AttributeError, ValueError):
+            return None
+        if row < 0 or not 0 <= col < COL_STRIDE:
+            return None
+        return row * COL_STRIDE + col
+    
+    @staticmethod
+    def cell_to_center(cell: int) -> Tuple[float, float]:
         """
-        Get the center coordinates of a grid cell.
+        Get the center coordinates of a packed grid cell.
         
         Returns (latitude, longitude).
         """
-        parts = cell_id.split('_')
-        row = int(parts[1])
-        col = int(parts[2])
+        row, col = divmod(cell, COL_STRIDE)
+        if row < _GRID_ROWS and col < _GRID_COLS:
+            return (_ROW_CENTER_LATS[row], _COL_CENTER_LNGS[col])
+        # Outside the grid (e.g. an arbitrary cell ID from the API)
         lat = DOUALA_BOUNDS['min_lat'] + (row + 0.5) * CELL_SIZE_DEG
         lng = DOUALA_BOUNDS['min_lng'] + (col + 0.5) * CELL_SIZE_DEG
         return (lat, lng)
@@ -165,46 +352,48 @@ class TrafficService:
         Calculate distance between two points in meters.
         Uses Haversine formula.
         """
-        R = 6371000  # Earth's radius in meters
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        dphi = math.radians(lat2 - lat1)
-        dlambda = math.radians(lng2 - lng1)
+        # Half-angle differences directly (degrees → radians / 2)
+        sin_dphi = sin((lat2 - lat1) * HALF_DEG_TO_RAD)
+        sin_dlambda = sin((lng2 - lng1) * HALF_DEG_TO_RAD)
         
-        a = (math.sin(dphi / 2) ** 2 +
-             math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        a = (sin_dphi * sin_dphi +
+             cos(lat1 * DEG_TO_RAD) * cos(lat2 * DEG_TO_RAD) * sin_dlambda * sin_dlambda)
         
-        return R * c
+        # asin form: one sqrt instead of atan2(sqrt(a), sqrt(1 - a))
+        return EARTH_DIAMETER_M * asin(sqrt(min(a, 1.0)))
     
     @staticmethod
     def speed_to_level(speed_kmh: float) -> str:
         """Convert average speed to a traffic level."""
-        if speed_kmh >= SPEED_FLUIDE:
-            return TrafficLevel.FLUIDE
-        elif speed_kmh >= SPEED_MODERE:
-            return TrafficLevel.MODERE
-        elif speed_kmh >= SPEED_DENSE:
-            return TrafficLevel.DENSE
-        else:
-            return TrafficLevel.BLOQUE
+        return _SPEED_LEVELS[bisect_right(_SPEED_THRESHOLDS, speed_kmh)]
     
     @staticmethod
     def level_to_color(level: str) -> str:
         """Convert traffic level to display color."""
-        return {
-            TrafficLevel.FLUIDE: '#4CAF50',   # Green
-            TrafficLevel.MODERE: '#FF9800',   # Orange
-            TrafficLevel.DENSE: '#F44336',    # Red
-            TrafficLevel.BLOQUE: '#880E4F',   # Dark Red
-            TrafficLevel.UNKNOWN: '#9E9E9E',  # Grey
-        }.get(level, '#9E9E9E')
+        return _LEVEL_COLORS.get(level, '#9E9E9E')
     
     # ---- Redis helpers ----
     
+    @classmethod
+    def _get_redis(cls):
+        """
+        Get Redis connection.
+        
+        The client (and its connection pool) is created once per process
+        and shared by all callers; redis-py clients are thread-safe.
+        """
+        client = cls._redis_client
+        if client is not None:
+            return client
+        
+        with cls._redis_lock:
+            if cls._redis_client is None:
+                cls._redis_client = cls._create_redis()
+            return cls._redis_client
+    
     @staticmethod
-    def _get_redis():
-        """Get Redis connection."""
+    def _create_redis():
+        """Build the Redis client from Django settings (None on failure)."""
         try:
             import redis
             redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
@@ -241,90 +430,142 @@ class TrafficService:
             return None
         
         now = time.time()
-        current_fix = CourierFix(
-            courier_id=courier_id,
-            latitude=latitude,
-            longitude=longitude,
-            timestamp=now
-        )
         
-        # Get previous fix for this courier
+        # Swap previous fix ↔ current fix in one atomic round-trip
         prev_key = f"{REDIS_PREFIX}:fix:{courier_id}"
-        prev_data = r.get(prev_key)
+        try:
+            prev_lat, prev_lng, prev_ts = cls._swap_fix(
+                r, courier_id, prev_key, latitude, longitude, now
+            )
+        except Exception as e:
+            logger.error(f"[TRAFFIC] Failed to store fix for courier {courier_id[:8]}: {e}")
+            return None
         
         speed_kmh = None
         
-        if prev_data:
+        if prev_ts is not None:
             try:
-                prev = json.loads(prev_data)
-                prev_fix = CourierFix(**prev)
-                
-                # Time delta
-                dt = now - prev_fix.timestamp
-                
-                # Only compute speed if:
-                # - Time gap is reasonable (not too old)
-                # - Time gap is not too small (avoid division by zero noise)
-                if 3 <= dt <= MAX_FIX_AGE:
-                    distance_m = cls.haversine_distance(
-                        prev_fix.latitude, prev_fix.longitude,
-                        latitude, longitude
-                    )
-                    
-                    # Only if distance is meaningful
-                    if distance_m >= MIN_DISTANCE:
-                        speed_ms = distance_m / dt
-                        speed_kmh = speed_ms * 3.6
-                        
-                        # Filter out GPS jumps (unrealistic speeds)
-                        if speed_kmh > MAX_REALISTIC_SPEED:
-                            logger.debug(
-                                f"[TRAFFIC] Filtered GPS jump: {speed_kmh:.1f} km/h "
-                                f"from courier {courier_id[:8]}"
-                            )
-                            speed_kmh = None
-                        else:
-                            # Record this speed observation in the grid
-                            cell_id = cls.latlng_to_cell(latitude, longitude)
-                            if cell_id:
-                                cls._record_observation(r, cell_id, speed_kmh, now)
-                                
-                                logger.debug(
-                                    f"[TRAFFIC] Courier {courier_id[:8]} → "
-                                    f"{cell_id} @ {speed_kmh:.1f} km/h"
-                                )
-            except (json.JSONDecodeError, TypeError, KeyError) as e:
+                speed_kmh = _compute_speed_kmh(
+                    float(prev_lat), float(prev_lng), float(prev_ts),
+                    latitude, longitude, now,
+                )
+            except (TypeError, ValueError) as e:
                 logger.debug(f"[TRAFFIC] Error parsing previous fix: {e}")
         
-        # Store current fix
-        r.setex(
-            prev_key,
-            MAX_FIX_AGE * 2,  # TTL = 2x max age
-            json.dumps(asdict(current_fix))
-        )
+        if speed_kmh is not None:
+            # Filter out GPS jumps (unrealistic speeds)
+            if speed_kmh > MAX_REALISTIC_SPEED:
+                logger.debug(
+                    f"[TRAFFIC] Filtered GPS jump: {speed_kmh:.1f} km/h "
+                    f"from courier {courier_id[:8]}"
+                )
+                speed_kmh = None
+            else:
+                # Record this speed observation in the grid
+                cell_id = cls.latlng_to_cell(latitude, longitude)
+                if cell_id is not None:
+                    pipe = r.pipeline(transaction=False)
+                    cls._record_observation(pipe, cell_id, speed_kmh, now)
+                    pipe.execute()
+                    
+                    logger.debug(
+                        f"[TRAFFIC] Courier {courier_id[:8]} → "
+                        f"{cls.cell_id_str(cell_id)} @ {speed_kmh:.1f} km/h"
+                    )
         
         return speed_kmh
     
+    @staticmethod
+    def _swap_fix(r, courier_id: str, prev_key: str,
+                  latitude: float, longitude: float, timestamp: float):
+        """
+        Store a courier fix and return the previous one.
+        
+        Runs SWAP_FIX_SCRIPT (EVALSHA once loaded). The fix is kept as a
+        hash {lat, lng, ts} so no JSON is encoded or decoded, and the
+        courier's last-seen time is updated in ONLINE_COURIERS_KEY.
+        
+        Returns:
+            (lat, lng, ts) strings of the previous fix, each None if absent
+        """
+        return TrafficService._script(r, SWAP_FIX_SCRIPT)(
+            keys=[prev_key, ONLINE_COURIERS_KEY],
+            args=[latitude, longitude, timestamp, MAX_FIX_AGE * 2, courier_id],  # TTL = 2x max age
+            client=r,
+        )
+    
+    @staticmethod
+    def _script(r, source: str):
+        """redis-py Script for a Lua source, registered once per process."""
+        script = _scripts.get(source)
+        if script is None:
+            script = _scripts[source] = r.register_script(source)
+        return script
+    
+    @staticmethod
+    def _obs_keys(cell_id: int) -> Tuple[str, str]:
+        """(timestamp set, speed set) keys of a cell's observations."""
+        return f"{REDIS_PREFIX}:obs:{cell_id}", f"{REDIS_PREFIX}:spd:{cell_id}"
+    
     @classmethod
-    def _record_observation(cls, r, cell_id: str, speed_kmh: float, timestamp: float):
+    def _record_observation(cls, pipe, cell_id: int, speed_kmh: float, timestamp: float):
         """
         Record a speed observation in a grid cell.
         
-        Uses a Redis sorted set: the score is the timestamp, the member
-        is the speed. This allows efficient cleanup of old observations.
+        Each observation has a unique member stored in two sorted sets:
+        one scored by timestamp (windowing and cleanup of old
+        observations) and one scored by speed, so readers get speeds as
+        native scores without parsing members.
+        
+        Commands are queued on `pipe` (a non-transactional pipeline);
+        the caller executes it.
         """
-        obs_key = f"{REDIS_PREFIX}:obs:{cell_id}"
+        obs_key, speed_key = cls._obs_keys(cell_id)
         
-        # Add observation: member = "speed:timestamp", score = timestamp
-        member = f"{speed_kmh:.1f}:{timestamp:.0f}"
-        r.zadd(obs_key, {member: timestamp})
+        member = f"{timestamp:.3f}:{uuid.uuid4().hex[:6]}"
+        pipe.zadd(obs_key, {member: timestamp})
+        pipe.zadd(speed_key, {member: round(speed_kmh, 1)})
         
-        # Remove observations older than OBSERVATION_TTL
+        # Remove observations older than OBSERVATION_TTL (from both sets)
         cutoff = timestamp - OBSERVATION_TTL
-        r.zremrangebyscore(obs_key, '-inf', cutoff)
+        cls._prune_cell(pipe, cell_id, cutoff)
+        
+        # Set TTL on the keys
+        pipe.expire(obs_key, OBSERVATION_TTL + 60)
+        pipe.expire(speed_key, OBSERVATION_TTL + 60)
         
-        # Set TTL on the key
-        r.expire(obs_key, OBSERVATION_TTL + 60)
+        # Track the cell for aggregation and cleanup
+        pipe.sadd(ACTIVE_CELLS_KEY, cell_id)
+    
+    @classmethod
+    def _prune_cell(cls, pipe, cell_id: int, cutoff: float) -> None:
+        """Queue PRUNE_OBSERVATIONS_SCRIPT for a cell on `pipe`."""
+        obs_key, speed_key = cls._obs_keys(cell_id)
+        cls._script(pipe, PRUNE_OBSERVATIONS_SCRIPT)(
+            keys=[obs_key, speed_key, ACTIVE_CELLS_KEY],
+            args=[cutoff, cell_id],
+            client=pipe,
+        )
+    
+    @classmethod
+    def _queue_speed_reads(cls, pipe, cell_id: int, cutoff: float) -> None:
+        """
+        Queue the reads needed for a cell's current speeds on `pipe`.
+        
+        Two replies per cell: all (member, speed) pairs, and the members
+        older than `cutoff` (not yet pruned) to leave out.
+        """
+        obs_key, speed_key = cls._obs_keys(cell_id)
+        pipe.zrange(speed_key, 0, -1, withscores=True)
+        pipe.zrangebyscore(obs_key, '-inf', cutoff)
+    
+    @staticmethod
+    def _current_speeds(scored: List[Tuple[str, float]], expired: List[str]) -> List[float]:
+        """Speeds of a cell's observations, minus the expired ones."""
+        if not expired:
+            return [speed for _, speed in scored]
+        expired = set(expired)
+        return [speed for member, speed in scored if member not in expired]
     
     # ---- Aggregation & Query ----
     
@@ -332,46 +573,100 @@ class TrafficService:
     def get_cell_traffic(cls, cell_id: str) -> Optional[TrafficCell]:
         """
         Get current traffic data for a specific grid cell.
+        
+        Takes the public "cell_<row>_<col>" ID (API boundary).
         """
+        cell = cls.parse_cell_id(cell_id)
+        if cell is None:
+            return None
+        
         r = cls._get_redis()
         if not r:
             return None
         
-        obs_key = f"{REDIS_PREFIX}:obs:{cell_id}"
-        
         # Get all current observations
         now = time.time()
         cutoff = now - OBSERVATION_TTL
-        observations = r.zrangebyscore(obs_key, cutoff, '+inf')
+        pipe = r.pipeline(transaction=False)
+        cls._queue_speed_reads(pipe, cell, cutoff)
+        scored, expired = pipe.execute()
         
-        if not observations or len(observations) < MIN_OBSERVATIONS:
-            return None
+        updated = datetime.fromtimestamp(now).isoformat()
+        return cls._build_cell(cell, cls._current_speeds(scored, expired), updated)
+    
+    @classmethod
+    def get_cells_traffic(cls, cell_ids: List[int]) -> Dict[int, TrafficCell]:
+        """
+        Get current traffic data for several grid cells at once.
         
-        # Parse speeds
-        speeds = []
-        for obs in observations:
-            try:
-                speed_str = obs.split(':')[0]
-                speeds.append(float(speed_str))
-            except (ValueError, IndexError):
-                continue
+        All reads go through a single pipeline, so the cost is one
+        Redis round-trip regardless of the number of cells.
+        Cells without enough data are omitted from the result.
+        """
+        cell_ids = [cell_id for cell_id in dict.fromkeys(cell_ids) if cell_id is not None]
+        if not cell_ids:
+            return {}
+        
+        r = cls._get_redis()
+        if not r:
+            return {}
+        
+        now = time.time()
+        cutoff = now - OBSERVATION_TTL
+        
+        pipe = r.pipeline(transaction=False)
+        for cell_id in cell_ids:
+            cls._queue_speed_reads(pipe, cell_id, cutoff)
+        replies = pipe.execute()
+        
+        # Same timestamp for every cell: format it once
+        updated = datetime.fromtimestamp(now).isoformat()
+        
+        cells = {}
+        for cell_id, scored, expired in zip(cell_ids, replies[::2], replies[1::2]):
+            cell = cls._build_cell(cell_id, cls._current_speeds(scored, expired), updated)
+            if cell:
+                cells[cell_id] = cell
+        return cells
+    
+    @classmethod
+    def _build_cell(cls, cell_id: int, speeds: List[float], updated: str) -> Optional[TrafficCell]:
+        """
+        Aggregate a cell's observed speeds into a TrafficCell.
         
-        if not speeds:
+        `updated` is the ISO timestamp of the read, formatted by the caller.
+        """
+        stats = cls._average_speed(speeds)
+        if not stats:
             return None
         
-        avg_speed = sum(speeds) / len(speeds)
+        avg_speed, sample_count = stats
         lat, lng = cls.cell_to_center(cell_id)
         
         return TrafficCell(
-            cell_id=cell_id,
+            cell_id=cls.cell_id_str(cell_id),
             lat=lat,
             lng=lng,
             avg_speed_kmh=round(avg_speed, 1),
             level=cls.speed_to_level(avg_speed),
-            sample_count=len(speeds),
-            last_updated=datetime.fromtimestamp(now).isoformat()
+            sample_count=sample_count,
+            last_updated=updated
         )
     
+    @staticmethod
+    def _average_speed(speeds: List[float]) -> Optional[Tuple[float, int]]:
+        """
+        Average of a cell's observed speeds.
+        
+        Returns:
+            (avg_speed_kmh, sample_count), or None if there are fewer than
+            MIN_OBSERVATIONS observations
+        """
+        if len(speeds) < MIN_OBSERVATIONS:
+            return None
+        
+        return sum(speeds) / len(speeds), len(speeds)
+    
     @classmethod
     def get_traffic_heatmap(cls, 
                             min_lat: float = None, max_lat: float = None,
@@ -387,94 +682,178 @@ class TrafficService:
         if not r:
             return []
         
-        # Check if we have a recent cached aggregation
-        cache_key = f"{REDIS_PREFIX}:heatmap"
-        cached = r.get(cache_key)
-        if cached:
-            try:
-                cells = json.loads(cached)
-                # Apply bbox filter if requested
-                if min_lat or max_lat or min_lng or max_lng:
-                    cells = [
-                        c for c in cells
-                        if (not min_lat or c['lat'] >= min_lat) and
-                           (not max_lat or c['lat'] <= max_lat) and
-                           (not min_lng or c['lng'] >= min_lng) and
-                           (not max_lng or c['lng'] <= max_lng)
-                    ]
-                return cells
-            except json.JSONDecodeError:
-                pass
-        
-        # Build fresh heatmap by scanning all observation keys
+        # None means "no bound" (0.0 is a valid coordinate)
+        has_bbox = any(bound is not None for bound in (min_lat, max_lat, min_lng, max_lng))
+        
+        # Check if we have a recent cached aggregation: the whole list
+        # without bbox, otherwise only the rows the bbox spans
+        try:
+            if has_bbox:
+                rows = cls._heatmap_rows(min_lat, max_lat)
+                cached = r.hmget(HEATMAP_CACHE_KEY, ['built'] + [f'row:{row}' for row in rows])
+                if cached[0]:
+                    return cls._filter_rows(
+                        [orjson.loads(row) for row in cached[1:] if row],
+                        min_lat, max_lat, min_lng, max_lng,
+                    )
+            else:
+                cached = r.hget(HEATMAP_CACHE_KEY, 'all')
+                if cached:
+                    return orjson.loads(cached)
+        except orjson.JSONDecodeError:
+            pass
+        
+        # Build fresh heatmap from all active cells
         cells = cls._aggregate_all_cells(r)
         
         # Cache the result
         if cells:
-            r.setex(cache_key, AGGREGATED_TTL, json.dumps(cells))
+            cls._cache_heatmap(r, cells)
         
         # Apply bbox filter
-        if min_lat or max_lat or min_lng or max_lng:
-            cells = [
-                c for c in cells
-                if (not min_lat or c['lat'] >= min_lat) and
-                   (not max_lat or c['lat'] <= max_lat) and
-                   (not min_lng or c['lng'] >= min_lng) and
-                   (not max_lng or c['lng'] <= max_lng)
-            ]
+        if has_bbox:
+            cells = cls._apply_bbox(cells, min_lat, max_lat, min_lng, max_lng)
+        
+        return cells
+    
+    @classmethod
+    def _cache_heatmap(cls, r, cells: List[Dict]) -> None:
+        """
+        Cache heatmap cells as a hash: the full JSON list under 'all',
+        each grid row's cells (sorted by longitude) under 'row:<row>',
+        and a numeric summary for get_traffic_stats ('cells',
+        'speed_sum', 'level:<LEVEL>').
+        """
+        rows = {}
+        for cell in cells:
+            row = cls.parse_cell_id(cell['cell_id']) // COL_STRIDE
+            rows.setdefault(row, []).append(cell)
+        
+        cell_count, total_speed, level_counts = cls._summarize_cells(cells)
+        
+        mapping = {
+            'built': time.time(),
+            'all': orjson.dumps(cells),
+            'cells': cell_count,
+            'speed_sum': total_speed,
+        }
+        for level, count in level_counts.items():
+            mapping[f'level:{level}'] = count
+        for row, row_cells in rows.items():
+            row_cells.sort(key=itemgetter('lng'))
+            mapping[f'row:{row}'] = orjson.dumps(row_cells)
+        
+        pipe = r.pipeline(transaction=True)
+        pipe.delete(HEATMAP_CACHE_KEY)
+        pipe.hset(HEATMAP_CACHE_KEY, mapping=mapping)
+        pipe.expire(HEATMAP_CACHE_KEY, AGGREGATED_TTL)
+        pipe.execute()
+    
+    @staticmethod
+    def _summarize_cells(cells: List[Dict]) -> Tuple[int, float, Dict[str, int]]:
+        """(cell count, sum of average speeds, cell count by level)."""
+        level_counts = {}
+        total_speed = 0
+        for cell in cells:
+            level = cell.get('level', TrafficLevel.UNKNOWN)
+            level_counts[level] = level_counts.get(level, 0) + 1
+            total_speed += cell.get('avg_speed', 0)
+        return len(cells), total_speed, level_counts
+    
+    @staticmethod
+    def _heatmap_rows(min_lat: Optional[float], max_lat: Optional[float]) -> range:
+        """
+        Grid rows that may hold cells centered within [min_lat, max_lat].
+        
+        One row of margin on each side; _filter_rows does the exact check.
+        """
+        last_row = _GRID_ROWS - 1
+        first = 0
+        if min_lat is not None:
+            first = int((min_lat - DOUALA_BOUNDS['min_lat']) / CELL_SIZE_DEG) - 1
+        last = last_row
+        if max_lat is not None:
+            last = int((max_lat - DOUALA_BOUNDS['min_lat']) / CELL_SIZE_DEG) + 1
+        return range(max(first, 0), min(last, last_row) + 1)
+    
+    @staticmethod
+    def _apply_bbox(cells: List[Dict],
+                    min_lat: float = None, max_lat: float = None,
+                    min_lng: float = None, max_lng: float = None) -> List[Dict]:
+        """Keep the heatmap cells inside a bbox (None bounds are open)."""
+        return [
+            c for c in cells
+            if (min_lat is None or c['lat'] >= min_lat) and
+               (max_lat is None or c['lat'] <= max_lat) and
+               (min_lng is None or c['lng'] >= min_lng) and
+               (max_lng is None or c['lng'] <= max_lng)
+        ]
+    
+    @staticmethod
+    def _filter_rows(rows: List[List[Dict]],
+                     min_lat: float = None, max_lat: float = None,
+                     min_lng: float = None, max_lng: float = None) -> List[Dict]:
+        """
+        Apply the bbox filter to cached heatmap rows.
         
+        All cells of a row share the same latitude, and rows are sorted by
+        longitude, so each row costs one latitude test and two bisects.
+        """
+        lng_key = itemgetter('lng')
+        cells = []
+        for row in rows:
+            lat = row[0]['lat']
+            if (min_lat is not None and lat < min_lat) or (max_lat is not None and lat > max_lat):
+                continue
+            start = bisect_left(row, min_lng, key=lng_key) if min_lng is not None else 0
+            end = bisect_right(row, max_lng, key=lng_key) if max_lng is not None else len(row)
+            cells.extend(row[start:end])
         return cells
     
     @classmethod
     def _aggregate_all_cells(cls, r) -> List[Dict]:
         """
-        Scan all observation keys and aggregate into cells.
+        Aggregate all active cells (ACTIVE_CELLS_KEY) into heatmap rows.
         """
         cells = []
         now = time.time()
         cutoff = now - OBSERVATION_TTL
         
-        # Scan for all observation keys
-        cursor = 0
-        while True:
-            cursor, keys = r.scan(cursor, match=f"{REDIS_PREFIX}:obs:cell_*", count=100)
+        updated = datetime.fromtimestamp(now).isoformat()
+        
+        cell_ids = [int(cell_id) for cell_id in r.smembers(ACTIVE_CELLS_KEY)]
+        if not cell_ids:
+            return cells
+        
+        # Speeds are summed in Redis, one script call per batch of cells,
+        # all batches in one round-trip
+        aggregate = cls._script(r, AGGREGATE_CELLS_SCRIPT)
+        pipe = r.pipeline(transaction=False)
+        for start in range(0, len(cell_ids), CELL_BATCH_SIZE):
+            keys = []
+            for cell_id in cell_ids[start:start + CELL_BATCH_SIZE]:
+                keys.extend(cls._obs_keys(cell_id))
+            aggregate(keys=keys, args=[cutoff], client=pipe)
+        replies = [value for batch in pipe.execute() for value in batch]
+        
+        for cell_id, total, sample_count in zip(cell_ids, replies[::2], replies[1::2]):
+            if sample_count < MIN_OBSERVATIONS:
+                continue
             
-            for key in keys:
-                cell_id = key.replace(f"{REDIS_PREFIX}:obs:", "")
-                
-                # Get observations
-                observations = r.zrangebyscore(key, cutoff, '+inf')
-                
-                if not observations or len(observations) < MIN_OBSERVATIONS:
-                    continue
-                
-                speeds = []
-                for obs in observations:
-                    try:
-                        speed_str = obs.split(':')[0]
-                        speeds.append(float(speed_str))
-                    except (ValueError, IndexError):
-                        continue
-                
-                if not speeds:
-                    continue
-                
-                avg_speed = sum(speeds) / len(speeds)
-                lat, lng = cls.cell_to_center(cell_id)
-                
-                cells.append({
-                    'cell_id': cell_id,
-                    'lat': round(lat, 6),
-                    'lng': round(lng, 6),
-                    'avg_speed': round(avg_speed, 1),
-                    'level': cls.speed_to_level(avg_speed),
-                    'color': cls.level_to_color(cls.speed_to_level(avg_speed)),
-                    'samples': len(speeds),
-                    'updated': datetime.fromtimestamp(now).isoformat(),
-                })
+            avg_speed = float(total) / sample_count
+            lat, lng = cls.cell_to_center(cell_id)
+            level = cls.speed_to_level(avg_speed)
             
-            if cursor == 0:
-                break
+            cells.append({
+                'cell_id': cls.cell_id_str(cell_id),
+                'lat': round(lat, 6),
+                'lng': round(lng, 6),
+                'avg_speed': round(avg_speed, 1),
+                'level': level,
+                'color': cls.level_to_color(level),
+                'samples': sample_count,
+                'updated': updated,
+            })
         
         logger.info(f"[TRAFFIC] Aggregated {len(cells)} active cells")
         return cells
@@ -490,26 +869,35 @@ class TrafficService:
         if not r:
             return {'active_cells': 0, 'online_couriers': 0}
         
-        cells = cls.get_traffic_heatmap()
-        
-        # Count cells by level
-        level_counts = {}
-        total_speed = 0
-        for cell in cells:
-            level = cell.get('level', TrafficLevel.UNKNOWN)
-            level_counts[level] = level_counts.get(level, 0) + 1
-            total_speed += cell.get('avg_speed', 0)
+        # Numeric summary cached with the heatmap (no JSON to decode);
+        # on a miss, build the heatmap and summarize it
+        levels = tuple(_LEVEL_COLORS)
+        summary = r.hmget(
+            HEATMAP_CACHE_KEY,
+            ['cells', 'speed_sum'] + [f'level:{level}' for level in levels],
+        )
+        if summary[0] is not None:
+            cell_count = int(summary[0])
+            total_speed = float(summary[1])
+            level_counts = {
+                level: int(count) for level, count in zip(levels, summary[2:]) if count
+            }
+        else:
+            cell_count, total_speed, level_counts = cls._summarize_cells(
+                cls.get_traffic_heatmap()
+            )
         
         # Count active courier fixes
-        courier_keys = list(r.scan_iter(match=f"{REDIS_PREFIX}:fix:*", count=100))
+        # Couriers with a fix still alive (same window as the fix TTL)
+        online_couriers = r.zcount(ONLINE_COURIERS_KEY, time.time() - MAX_FIX_AGE * 2, '+inf')
         
-        avg_city_speed = total_speed / len(cells) if cells else 0
+        avg_city_speed = total_speed / cell_count if cell_count else 0
         
         return {
-            'active_cells': len(cells),
-            'online_couriers': len(courier_keys),
+            'active_cells': cell_count,
+            'online_couriers': online_couriers,
             'avg_city_speed_kmh': round(avg_city_speed, 1),
-            'overall_level': cls.speed_to_level(avg_city_speed) if cells else TrafficLevel.UNKNOWN,
+            'overall_level': cls.speed_to_level(avg_city_speed) if cell_count else TrafficLevel.UNKNOWN,
             'cells_by_level': level_counts,
             'timestamp': timezone.now().isoformat(),
         }
@@ -525,21 +913,19 @@ class TrafficService:
         Useful for coloring a route polyline.
         """
         results = []
-        seen_cells = set()
         
-        for lat, lng in waypoints:
-            cell_id = cls.latlng_to_cell(lat, lng)
-            if not cell_id or cell_id in seen_cells:
-                continue
-            seen_cells.add(cell_id)
-            
-            cell = cls.get_cell_traffic(cell_id)
+        # Unique cells in route order, fetched in one round-trip
+        cell_ids = list(dict.fromkeys(cls.points_to_cells(waypoints)))
+        cells_traffic = cls.get_cells_traffic(cell_ids)
+        
+        for cell_id in cell_ids:
+            cell = cells_traffic.get(cell_id)
             if cell:
                 results.append(cell.to_dict())
             else:
                 center_lat, center_lng = cls.cell_to_center(cell_id)
                 results.append({
-                    'cell_id': cell_id,
+                    'cell_id': cls.cell_id_str(cell_id),
                     'lat': center_lat,
                     'lng': center_lng,
                     'avg_speed_kmh': 0,
@@ -566,24 +952,20 @@ class TrafficService:
         cutoff = now - OBSERVATION_TTL
         cleaned = 0
         
-        cursor = 0
-        while True:
-            cursor, keys = r.scan(cursor, match=f"{REDIS_PREFIX}:obs:*", count=100)
-            
-            for key in keys:
-                # Remove old observations
-                removed = r.zremrangebyscore(key, '-inf', cutoff)
-                cleaned += removed
-                
-                # Remove empty keys
-                if r.zcard(key) == 0:
-                    r.delete(key)
-            
-            if cursor == 0:
-                break
+        # Remove old observations, empty keys and inactive cells, one
+        # round-trip per batch of cells
+        cell_ids = [int(cell_id) for cell_id in r.smembers(ACTIVE_CELLS_KEY)]
+        for start in range(0, len(cell_ids), CELL_BATCH_SIZE):
+            pipe = r.pipeline(transaction=False)
+            for cell_id in cell_ids[start:start + CELL_BATCH_SIZE]:
+                cls._prune_cell(pipe, cell_id, cutoff)
+            cleaned += sum(pipe.execute())
+        
+        # Forget couriers whose last fix has expired
+        r.zremrangebyscore(ONLINE_COURIERS_KEY, '-inf', now - MAX_FIX_AGE * 2)
         
         # Clear the heatmap cache to force refresh
-        r.delete(f"{REDIS_PREFIX}:heatmap")
+        r.delete(HEATMAP_CACHE_KEY)
         
         logger.info(f"[TRAFFIC] Cleanup: removed {cleaned} stale observations")
         return cleaned
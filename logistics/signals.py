@@ -5,31 +5,48 @@ Auto-dispatch orders and broadcast real-time events.
 """
 
 import logging
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-
-from logistics.models import Delivery, DeliveryStatus
+from django.utils import timezone
+
+from core.models import User
+from core.onboarding_service import OnboardingService
+from finance.models import WalletService
+from logistics.events import queue_delivery_status
+from logistics.models import Delivery, DeliveryStatus, PaymentMethod
+from logistics.services.smart_dispatch import invalidate_courier_cache
+from logistics.tasks import (
+    broadcast_delivery_assigned,
+    broadcast_new_delivery_event,
+    dispatch_new_delivery,
+    notify_delivery_status,
+    send_delivery_receipt,
+    send_new_delivery_otps,
+    send_rating_request,
+)
 
 logger = logging.getLogger(__name__)
 
 
-# Store previous status for change detection
-_previous_status = {}
+# Tracking message broadcast with each status change
+_STATUS_MESSAGES = {
+    DeliveryStatus.ASSIGNED: "Un coursier a accepté votre commande",
+    DeliveryStatus.PICKED_UP: "Le coursier a récupéré votre colis",
+    DeliveryStatus.IN_TRANSIT: "Votre colis est en route",
+    DeliveryStatus.COMPLETED: "Livraison effectuée avec succès!",
+    DeliveryStatus.CANCELLED: "La commande a été annulée",
+    DeliveryStatus.FAILED: "La livraison a échoué",
+}
 
 
-@receiver(pre_save, sender=Delivery)
-def capture_previous_status(sender, instance, **kwargs):
-    """Capture the previous status before save for change detection."""
-    if instance.pk:
-        try:
-            old_instance = Delivery.objects.get(pk=instance.pk)
-            _previous_status[instance.pk] = old_instance.status
-        except Delivery.DoesNotExist:
-            pass
+def _skips_status(update_fields) -> bool:
+    """True when a save(update_fields=...) call cannot change the status."""
+    return bool(update_fields) and 'status' not in update_fields
 
 
-@receiver(post_save, sender=Delivery)
-def on_delivery_saved(sender, instance, created, **kwargs):
+@receiver(post_save, sender=Delivery, dispatch_uid='logistics.on_delivery_saved')
+def on_delivery_saved(sender, instance, created, update_fields=None, **kwargs):
     """
     Handle delivery creation and updates.
     
@@ -40,250 +57,162 @@ def on_delivery_saved(sender, instance, created, **kwargs):
     On status change:
     - Broadcast status update to tracking clients
     - Trigger financial transactions on completion
+    
+    Status changes are detected against the status snapshotted when the
+    instance was loaded (Delivery.from_db), so no extra query is needed.
+    Updates saved with update_fields that exclude 'status' are ignored.
     """
     if created:
+        instance._loaded_status = instance.status
         _handle_new_delivery(instance)
-    else:
+    elif not _skips_status(update_fields):
         _handle_delivery_update(instance)
 
 
 def _handle_new_delivery(delivery: Delivery):
-    """Handle a newly created delivery."""
+    """
+    Handle a newly created delivery.
+    
+    WhatsApp OTPs, the WebSocket broadcast and smart dispatch run as
+    Celery tasks once the transaction commits.
+    """
     if delivery.status != DeliveryStatus.PENDING:
         return
     
-    logger.info(f"[SIGNAL] New delivery created: {delivery.id}")
-    
-    # =============================================
-    # Send OTP codes via WhatsApp
-    # =============================================
-    try:
-        from bot.whatsapp_service import (
-            send_order_confirmation_to_sender,
-            send_otp_to_recipient,
-        )
-        
-        # Send both OTPs (pickup + delivery) to the sender
-        send_order_confirmation_to_sender(delivery)
-        logger.info(f"[SIGNAL] Order confirmation + OTPs sent to sender for {str(delivery.id)[:8]}")
-        
-        # Send the delivery OTP to the recipient
-        if delivery.recipient_phone:
-            send_otp_to_recipient(delivery)
-            logger.info(f"[SIGNAL] Delivery OTP sent to recipient for {str(delivery.id)[:8]}")
-        
-    except Exception as e:
-        logger.warning(f"[SIGNAL] WhatsApp OTP notification failed: {e}")
-    
-    # =============================================
-    # Broadcast new delivery event (WebSocket)
-    # =============================================
-    try:
-        from logistics.events import broadcast_new_delivery
-        
-        delivery_data = {
-            'id': str(delivery.id),
-            'pickup_address': delivery.pickup_address or '',
-            'dropoff_address': delivery.dropoff_address or '',
-            'total_price': str(delivery.total_price),
-            'courier_earning': str(delivery.courier_earning),
-            'distance_km': delivery.distance_km,
-        }
-        
-        broadcast_new_delivery(delivery_data)
-    except Exception as e:
-        logger.warning(f"[SIGNAL] Broadcast new delivery failed: {e}")
-    
-    # Smart dispatch to couriers
-    try:
-        from logistics.services.smart_dispatch import smart_dispatch_order
-        
-        # Use smart dispatch with scoring algorithm
-        result = smart_dispatch_order(str(delivery.id), auto_assign=False)
-        
-        logger.info(
-            f"[SIGNAL] Smart dispatch for {str(delivery.id)[:8]}: "
-            f"{result.get('message', 'unknown')}"
-        )
-        
-        if result.get('couriers'):
-            top_courier = result['couriers'][0]
-            logger.info(
-                f"[SIGNAL] Top courier: {top_courier['name']} "
-                f"(score: {top_courier['score']})"
-            )
+    logger.info("[SIGNAL] New delivery created: %s", delivery.id)
     
-    except ImportError:
-        # Fallback to basic dispatch if smart dispatch unavailable
-        logger.warning("[SIGNAL] Smart dispatch unavailable, using basic dispatch")
-        from logistics.services.dispatch import dispatch_order
-        
+    delivery_id = str(delivery.id)
+    _enqueue_on_commit(send_new_delivery_otps, delivery_id)
+    _enqueue_on_commit(broadcast_new_delivery_event, delivery_id)
+    _enqueue_on_commit(dispatch_new_delivery, delivery_id)
+
+
+def _enqueue_on_commit(task, delivery_id: str, *args):
+    """Queue a Celery task for the delivery once the current transaction commits."""
+    def _enqueue():
         try:
-            notified_count = dispatch_order(str(delivery.id))
-            logger.info(
-                f"[SIGNAL] Basic dispatch for {str(delivery.id)[:8]}: "
-                f"{notified_count} couriers notified"
-            )
+            task.delay(delivery_id, *args)
         except Exception as e:
-            logger.error(f"[SIGNAL] Basic dispatch failed: {e}")
+            logger.error("[SIGNAL] Failed to enqueue %s for %.8s: %s", task.name, delivery_id, e)
     
-    except Exception as e:
-        logger.error(f"[SIGNAL] Smart dispatch failed for {delivery.id}: {e}")
+    transaction.on_commit(_enqueue)
 
 
 def _handle_delivery_update(delivery: Delivery):
     """Handle delivery status changes."""
-    previous = _previous_status.pop(delivery.pk, None)
+    previous = getattr(delivery, '_loaded_status', None)
+    delivery._loaded_status = delivery.status
     
     if previous is None or previous == delivery.status:
         return  # No status change
     
+    delivery_id = str(delivery.id)
+    
     logger.info(
-        f"[SIGNAL] Delivery {str(delivery.id)[:8]} status: "
-        f"{previous} -> {delivery.status}"
+        "[SIGNAL] Delivery %.8s status: %s -> %s",
+        delivery_id, previous, delivery.status
     )
     
     # Broadcast status change
     try:
-        from logistics.events import broadcast_delivery_status
-        
-        status_messages = {
-            DeliveryStatus.ASSIGNED: "Un coursier a accepté votre commande",
-            DeliveryStatus.PICKED_UP: "Le coursier a récupéré votre colis",
-            DeliveryStatus.IN_TRANSIT: "Votre colis est en route",
-            DeliveryStatus.COMPLETED: "Livraison effectuée avec succès!",
-            DeliveryStatus.CANCELLED: "La commande a été annulée",
-            DeliveryStatus.FAILED: "La livraison a échoué",
-        }
-        
-        message = status_messages.get(delivery.status, "")
+        message = _STATUS_MESSAGES.get(delivery.status, "")
         
-        broadcast_delivery_status(
-            str(delivery.id),
+        queue_delivery_status(
+            delivery_id,
             delivery.status,
             message
         )
     except Exception as e:
-        logger.warning(f"[SIGNAL] Status broadcast failed: {e}")
+        logger.warning("[SIGNAL] Status broadcast failed: %s", e)
     
     # =============================================
     # WhatsApp notifications on status change
     # =============================================
-    try:
-        from bot.whatsapp_service import notify_delivery_status_change
-        
-        # Unified dispatcher: handles ALL statuses for sender + recipient
-        # Each notification checks NotificationConfiguration before sending
-        notify_delivery_status_change(delivery, delivery.status)
-        
-    except Exception as e:
-        logger.warning(f"[SIGNAL] WhatsApp status notification failed: {e}")
+    # Sent by a worker once the save commits, with the status of this
+    # transition (the row may move on before the task runs)
+    _enqueue_on_commit(notify_delivery_status, delivery_id, delivery.status)
     
     # Handle completion - trigger financial transactions
     if delivery.status == DeliveryStatus.COMPLETED:
         _handle_delivery_completed(delivery)
     
     # Handle assignment - notify courier
-    if delivery.status == DeliveryStatus.ASSIGNED and delivery.courier:
+    if delivery.status == DeliveryStatus.ASSIGNED and delivery.courier_id:
         _handle_delivery_assigned(delivery)
 
 
 def _handle_delivery_completed(delivery: Delivery):
     """Process financial transactions when delivery is completed."""
-    logger.info(f"[SIGNAL] Processing completion for {str(delivery.id)[:8]}")
+    delivery_id = str(delivery.id)
+    logger.info("[SIGNAL] Processing completion for %.8s", delivery_id)
+    
+    # Denormalize last completion time on the courier (used by smart dispatch)
+    if delivery.courier_id:
+        _record_courier_completion(delivery)
     
     try:
-        from finance.models import WalletService
-        from logistics.models import PaymentMethod
-        
         if delivery.payment_method == PaymentMethod.CASH_P2P:
             WalletService.process_cash_delivery(delivery)
-            logger.info(f"[SIGNAL] CASH payment processed for {str(delivery.id)[:8]}")
+            logger.info("[SIGNAL] CASH payment processed for %.8s", delivery_id)
         
         elif delivery.payment_method == PaymentMethod.PREPAID_WALLET:
             WalletService.process_prepaid_delivery(delivery)
-            logger.info(f"[SIGNAL] PREPAID payment processed for {str(delivery.id)[:8]}")
-    
-    except Exception as e:
-        logger.error(f"[SIGNAL] Financial processing failed for {delivery.id}: {e}")
-    
-    # Generate receipt PDF
-    try:
-        from finance.invoice_service import InvoiceService
-        
-        invoice = InvoiceService.generate_delivery_receipt(delivery)
-        logger.info(f"[SIGNAL] Receipt generated: {invoice.invoice_number}")
-        
-        # Send receipt via WhatsApp to recipient
-        try:
-            InvoiceService.send_receipt_via_whatsapp(invoice)
-            logger.info(f"[SIGNAL] Receipt sent via WhatsApp for {invoice.invoice_number}")
-        except Exception as wa_error:
-            logger.warning(f"[SIGNAL] WhatsApp send failed: {wa_error}")
+            logger.info("[SIGNAL] PREPAID payment processed for %.8s", delivery_id)
     
     except Exception as e:
-        logger.warning(f"[SIGNAL] Receipt generation failed for {delivery.id}: {e}")
+        logger.error("[SIGNAL] Financial processing failed for %s: %s", delivery_id, e)
     
-    # Send rating request via WhatsApp
-    try:
-        from logistics.rating_service import RatingService
-        RatingService.send_rating_request_via_whatsapp(delivery)
-        logger.info(f"[SIGNAL] Rating request sent for delivery {delivery.id}")
-    except Exception as e:
-        logger.warning(f"[SIGNAL] Rating request failed for {delivery.id}: {e}")
+    # Receipt PDF + WhatsApp and the rating request run in workers
+    _enqueue_on_commit(send_delivery_receipt, delivery_id)
+    _enqueue_on_commit(send_rating_request, delivery_id)
     
     # Track probation progress for courier onboarding
-    if delivery.courier:
+    if delivery.courier_id:
         try:
-            from core.onboarding_service import OnboardingService
-            from core.models import User
-            
             courier = delivery.courier
             
             if courier.onboarding_status == User.OnboardingStatus.PROBATION:
                 result = OnboardingService.record_probation_delivery(courier)
                 
                 if result.get('auto_approved'):
-                    logger.info(f"[SIGNAL] Courier {courier.id} auto-approved after probation!")
+                    logger.info("[SIGNAL] Courier %s auto-approved after probation!", courier.id)
                 else:
                     logger.info(
-                        f"[SIGNAL] Probation delivery {result.get('count', 0)}/"
-                        f"{result.get('needed', 20)} for courier {courier.id}"
+                        "[SIGNAL] Probation delivery %s/%s for courier %s",
+                        result.get('count', 0), result.get('needed', 20), courier.id
                     )
         except Exception as e:
-            logger.warning(f"[SIGNAL] Onboarding tracking failed: {e}")
+            logger.warning("[SIGNAL] Onboarding tracking failed: %s", e)
 
 
     
     # Invalidate courier cache for updated stats
-    if delivery.courier:
+    if delivery.courier_id:
         try:
-            from logistics.services.smart_dispatch import invalidate_courier_cache
-            invalidate_courier_cache(str(delivery.courier.id))
+            invalidate_courier_cache(str(delivery.courier_id))
         except Exception:
             pass
 
 
-def _handle_delivery_assigned(delivery: Delivery):
-    """Notify courier when they are assigned to a delivery."""
-    try:
-        from logistics.events import broadcast_order_assigned
-        
-        details = {
-            'pickup_address': delivery.pickup_address or 'GPS fourni',
-            'dropoff_address': delivery.dropoff_address or 'GPS fourni',
-            'recipient_phone': delivery.recipient_phone,
-            'total_price': str(delivery.total_price),
-            'courier_earning': str(delivery.courier_earning),
-            'otp_code': delivery.otp_code,  # For delivery confirmation
-            'pickup_otp': delivery.pickup_otp,  # For pickup confirmation (courier needs to verify)
-        }
-        
-        broadcast_order_assigned(
-            str(delivery.courier.id),
-            str(delivery.id),
-            details
+def _record_courier_completion(delivery: Delivery):
+    """Store the completion time on the courier row once the save commits."""
+    courier_id = delivery.courier_id
+    completed_at = delivery.completed_at or timezone.now()
+    
+    def _update():
+        User.objects.filter(pk=courier_id).update(
+            last_completed_delivery_at=completed_at
         )
-    except Exception as e:
-        logger.warning(f"[SIGNAL] Assignment notification failed: {e}")
+    
+    transaction.on_commit(_update)
+
 
+def _handle_delivery_assigned(delivery: Delivery):
+    """Notify courier when they are assigned to a delivery (after commit)."""
+    delivery_id = str(delivery.id)
+    
+    logger.info(
+        "[SIGNAL] Delivery %.8s assigned to courier %.8s",
+        delivery_id, delivery.courier_id
+    )
+    _enqueue_on_commit(broadcast_delivery_assigned, delivery_id)
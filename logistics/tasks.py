@@ -1,7 +1,8 @@
 """
 LOGISTICS App - Celery Tasks
 
-Periodic tasks for traffic data management and other logistics operations.
+Periodic tasks for traffic data management, and delivery side effects
+(notifications, dispatch, receipts) deferred out of the request thread.
 """
 
 from celery import shared_task
@@ -9,18 +10,42 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Resolve the dispatcher once: smart dispatch, or the basic one if the
+# smart dispatch module cannot be imported.
+try:
+    from logistics.services.smart_dispatch import smart_dispatch_order as _dispatch
+    _dispatch_kind = 'smart'
+except ImportError:
+    from logistics.services.dispatch import dispatch_order as _dispatch
+    _dispatch_kind = 'basic'
+
 
 @shared_task(name='logistics.tasks.cleanup_traffic_data')
 def cleanup_traffic_data():
     """
     Clean up stale traffic observations.
     
-    Runs every 5 minutes to remove expired speed observations
-    and refresh the aggregated heatmap cache.
+    Runs every 5 minutes to remove expired speed observations,
+    refresh the aggregated heatmap cache and deactivate expired
+    traffic events.
     """
+    try:
+        from django.utils import timezone
+        from logistics.models import TrafficEvent
+        
+        # Single set-based UPDATE, no rows loaded into Python
+        expired = TrafficEvent.objects.filter(
+            is_active=True,
+            expires_at__lt=timezone.now(),
+        ).update(is_active=False)
+        if expired:
+            logger.info(f"[TRAFFIC TASK] Deactivated {expired} expired events")
+    except Exception as e:
+        logger.error(f"[TRAFFIC TASK] Event expiry failed: {e}")
+    
     try:
         from logistics.services.traffic_service import TrafficService
-        cleaned = TrafficService.cleanup_stale_data()
+        cleaned = TrafficService.cleanup_stale_data() or 0
         logger.info(f"[TRAFFIC TASK] Cleaned {cleaned} stale observations")
         return cleaned
     except Exception as e:
@@ -35,6 +60,11 @@ def aggregate_traffic_heatmap():
     
     Runs every 2 minutes to ensure the heatmap API
     serves fresh data.
+    
+    The two calls stay sequential on purpose: the heatmap build caches the
+    numeric summary that get_traffic_stats reads back with one HMGET, so
+    the stats step is nearly free here, while running it in parallel
+    would rebuild the heatmap a second time on a cache miss.
     """
     try:
         from logistics.services.traffic_service import TrafficService
@@ -52,3 +82,235 @@ def aggregate_traffic_heatmap():
     except Exception as e:
         logger.error(f"[TRAFFIC TASK] Heatmap refresh failed: {e}")
         return {}
+
+
+@shared_task(name='logistics.tasks.rebuild_courier_geo_index')
+def rebuild_courier_geo_index():
+    """
+    Backfill the Redis courier geo index from Postgres.
+    
+    Runs every 5 minutes (below the index TTL) so couriers who are online
+    without having sent a position since a deploy or a Redis flush are
+    indexed, then marks the index as complete for dispatch.
+    """
+    try:
+        from core.models import User, UserRole
+        from logistics.services.courier_geo_index import CourierGeoIndex
+        
+        rows = User.objects.filter(
+            role=UserRole.COURIER,
+            is_online=True,
+            last_location__isnull=False,
+        ).values_list('id', 'last_location')
+        
+        indexed = CourierGeoIndex.rebuild(
+            (courier_id, location.y, location.x) for courier_id, location in rows
+        )
+        logger.info(f"[GEO_INDEX TASK] Rebuilt with {indexed} couriers")
+        return indexed or 0
+    except Exception as e:
+        logger.error(f"[GEO_INDEX TASK] Rebuild failed: {e}")
+        return 0
+
+
+# ===========================================
+# DELIVERY SIDE EFFECTS
+# ===========================================
+# Enqueued by logistics.signals once the delivery transaction commits, so
+# WhatsApp calls, PDF generation and dispatch never run inside the
+# request thread and never fire for a rolled-back save.
+
+def _get_delivery(delivery_id: str):
+    """Reload a delivery in the worker, or None if it no longer exists."""
+    from logistics.models import Delivery
+    
+    delivery = (
+        Delivery.objects.select_related('courier', 'sender')
+        .filter(pk=delivery_id)
+        .first()
+    )
+    if delivery is None:
+        logger.warning(f"[DELIVERY TASK] Delivery {delivery_id} not found")
+    return delivery
+
+
+@shared_task(name='logistics.tasks.send_new_delivery_otps')
+def send_new_delivery_otps(delivery_id: str):
+    """Send the order confirmation + OTPs to the sender and recipient."""
+    delivery = _get_delivery(delivery_id)
+    if delivery is None:
+        return
+    
+    try:
+        from bot.whatsapp_service import (
+            send_order_confirmation_to_sender,
+            send_otp_to_recipient,
+        )
+        
+        # Send both OTPs (pickup + delivery) to the sender
+        send_order_confirmation_to_sender(delivery)
+        logger.info(f"[DELIVERY TASK] Order confirmation + OTPs sent to sender for {delivery_id[:8]}")
+        
+        # Send the delivery OTP to the recipient
+        if delivery.recipient_phone:
+            send_otp_to_recipient(delivery)
+            logger.info(f"[DELIVERY TASK] Delivery OTP sent to recipient for {delivery_id[:8]}")
+    
+    except Exception as e:
+        logger.warning(f"[DELIVERY TASK] WhatsApp OTP notification failed: {e}")
+
+
+@shared_task(name='logistics.tasks.broadcast_new_delivery_event')
+def broadcast_new_delivery_event(delivery_id: str):
+    """Broadcast a new delivery to connected couriers (WebSocket)."""
+    delivery = _get_delivery(delivery_id)
+    if delivery is None:
+        return
+    
+    try:
+        from logistics.events import broadcast_new_delivery
+        
+        broadcast_new_delivery({
+            'id': delivery_id,
+            'pickup_address': delivery.pickup_address or '',
+            'dropoff_address': delivery.dropoff_address or '',
+            'total_price': str(delivery.total_price),
+            'courier_earning': str(delivery.courier_earning),
+            'distance_km': delivery.distance_km,
+        })
+    except Exception as e:
+        logger.warning(f"[DELIVERY TASK] Broadcast new delivery failed: {e}")
+
+
+@shared_task(name='logistics.tasks.dispatch_new_delivery')
+def dispatch_new_delivery(delivery_id: str):
+    """Run smart dispatch for a new delivery that is still pending."""
+    from logistics.models import Delivery, DeliveryStatus
+    
+    status = (
+        Delivery.objects.filter(pk=delivery_id)
+        .values_list('status', flat=True)
+        .first()
+    )
+    if status != DeliveryStatus.PENDING:
+        logger.info(f"[DELIVERY TASK] Skipping dispatch for {delivery_id[:8]} (status: {status})")
+        return
+    
+    if _dispatch_kind == 'basic':
+        try:
+            notified_count = _dispatch(delivery_id)
+            logger.info(
+                f"[DELIVERY TASK] Basic dispatch for {delivery_id[:8]}: "
+                f"{notified_count} couriers notified"
+            )
+        except Exception as e:
+            logger.error(f"[DELIVERY TASK] Basic dispatch failed: {e}")
+        return
+    
+    try:
+        result = _dispatch(delivery_id, auto_assign=False)
+        
+        logger.info(
+            f"[DELIVERY TASK] Smart dispatch for {delivery_id[:8]}: "
+            f"{result.get('message', 'unknown')}"
+        )
+        
+        if result.get('couriers'):
+            top_courier = result['couriers'][0]
+            logger.info(
+                f"[DELIVERY TASK] Top courier: {top_courier['name']} "
+                f"(score: {top_courier['score']})"
+            )
+    
+    except Exception as e:
+        logger.error(f"[DELIVERY TASK] Smart dispatch failed for {delivery_id}: {e}")
+
+
+@shared_task(name='logistics.tasks.notify_delivery_status')
+def notify_delivery_status(delivery_id: str, status: str):
+    """
+    Send the WhatsApp notifications (sender + recipient) for a status change.
+    
+    Not retried: the dispatcher already logs per-recipient failures, and a
+    retry would resend to the side that was reached.
+    """
+    delivery = _get_delivery(delivery_id)
+    if delivery is None:
+        return
+    
+    try:
+        from bot.whatsapp_service import notify_delivery_status_change
+        
+        # Unified dispatcher: handles ALL statuses for sender + recipient
+        # Each notification checks NotificationConfiguration before sending
+        notify_delivery_status_change(delivery, status)
+    except Exception as e:
+        logger.warning(f"[DELIVERY TASK] WhatsApp status notification failed: {e}")
+
+
+@shared_task(name='logistics.tasks.send_delivery_receipt')
+def send_delivery_receipt(delivery_id: str):
+    """Generate the receipt PDF of a completed delivery and send it via WhatsApp."""
+    delivery = _get_delivery(delivery_id)
+    if delivery is None:
+        return
+    
+    try:
+        from finance.invoice_service import InvoiceService
+        
+        invoice = InvoiceService.generate_delivery_receipt(delivery)
+        logger.info(f"[DELIVERY TASK] Receipt generated: {invoice.invoice_number}")
+        
+        # Send receipt via WhatsApp to recipient
+        try:
+            InvoiceService.send_receipt_via_whatsapp(invoice)
+            logger.info(f"[DELIVERY TASK] Receipt sent via WhatsApp for {invoice.invoice_number}")
+        except Exception as wa_error:
+            logger.warning(f"[DELIVERY TASK] WhatsApp send failed: {wa_error}")
+    
+    except Exception as e:
+        logger.warning(f"[DELIVERY TASK] Receipt generation failed for {delivery_id}: {e}")
+
+
+@shared_task(name='logistics.tasks.send_rating_request')
+def send_rating_request(delivery_id: str):
+    """Ask the recipient to rate a completed delivery via WhatsApp."""
+    delivery = _get_delivery(delivery_id)
+    if delivery is None:
+        return
+    
+    try:
+        from logistics.rating_service import RatingService
+        RatingService.send_rating_request_via_whatsapp(delivery)
+        logger.info(f"[DELIVERY TASK] Rating request sent for delivery {delivery_id}")
+    except Exception as e:
+        logger.warning(f"[DELIVERY TASK] Rating request failed for {delivery_id}: {e}")
+
+
+@shared_task(name='logistics.tasks.broadcast_delivery_assigned')
+def broadcast_delivery_assigned(delivery_id: str):
+    """Push the assignment details to the assigned courier (WebSocket)."""
+    delivery = _get_delivery(delivery_id)
+    if delivery is None or delivery.courier_id is None:
+        return
+    
+    try:
+        from logistics.events import broadcast_order_assigned
+        
+        details = {
+            'pickup_address': delivery.pickup_address or 'GPS fourni',
+            'dropoff_address': delivery.dropoff_address or 'GPS fourni',
+            'recipient_phone': delivery.recipient_phone,
+            'total_price': str(delivery.total_price),
+            'courier_earning': str(delivery.courier_earning),
+            'otp_code': delivery.otp_code,  # For delivery confirmation
+            'pickup_otp': delivery.pickup_otp,  # For pickup confirmation (courier needs to verify)
+        }
+        
+        broadcast_order_assigned(
+            str(delivery.courier_id),
+            delivery_id,
+            details
+        )
+    except Exception as e:
+        logger.warning(f"[DELIVERY TASK] Assignment notification failed: {e}")
@@ -5,32 +5,37 @@ Tests the complete flow: creation → assignment → pickup → delivery → pay
 """
 
 from decimal import Decimal
-from django.test import TransactionTestCase
+from django.test import SimpleTestCase, TestCase
 from django.contrib.gis.geos import Point
 from django.utils import timezone
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 
 from core.models import User, UserRole
-from logistics.models import Delivery, DeliveryStatus, PaymentMethod, Neighborhood, City
+from logistics.models import Delivery, DeliveryStatus, PaymentMethod, Neighborhood, City, generate_otp
 from finance.models import Transaction, TransactionType, Invoice, InvoiceType
 
 
-class E2EDeliveryFlowTest(TransactionTestCase):
+# Shared PDF renderer stub (dummy bytes), installed in setUp
+_PDF_MOCK = MagicMock(return_value=b'%PDF-1.4 dummy pdf content')
+
+
+class E2EDeliveryFlowTest(TestCase):
     """
     End-to-end tests for the complete delivery lifecycle.
     """
     
-    def setUp(self):
-        """Set up test data."""
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data once for the class."""
         # Create sender (client)
-        self.sender = User.objects.create_user(
+        cls.sender = User.objects.create_user(
             phone_number='+237699000001',
             full_name='Test Client',
             role=UserRole.CLIENT
         )
         
         # Create courier with initial balance
-        self.courier = User.objects.create_user(
+        cls.courier = User.objects.create_user(
             phone_number='+237699000002',
             full_name='Test Courier',
             role=UserRole.COURIER,
@@ -40,7 +45,7 @@ class E2EDeliveryFlowTest(TransactionTestCase):
         )
         
         # Create business partner with wallet
-        self.business = User.objects.create_user(
+        cls.business = User.objects.create_user(
             phone_number='+237699000003',
             full_name='Test Business',
             role=UserRole.BUSINESS,
@@ -48,21 +53,30 @@ class E2EDeliveryFlowTest(TransactionTestCase):
             wallet_balance=Decimal('50000.00')
         )
         
+        # GPS coordinates (also the neighborhood centers)
+        cls.pickup_point = Point(9.7042, 4.0502)
+        cls.dropoff_point = Point(9.6877, 4.0205)
+        
         # Create neighborhoods
-        self.pickup_neighborhood = Neighborhood.objects.create(
+        cls.pickup_neighborhood = Neighborhood.objects.create(
             city=City.DOUALA,
             name='Akwa',
-            center_geo=Point(9.7042, 4.0502)
+            center_geo=cls.pickup_point
         )
-        self.dropoff_neighborhood = Neighborhood.objects.create(
+        cls.dropoff_neighborhood = Neighborhood.objects.create(
             city=City.DOUALA,
             name='Bonapriso',
-            center_geo=Point(9.6877, 4.0205)
+            center_geo=cls.dropoff_point
         )
+    
+    def setUp(self):
+        # Never render real PDFs: swap in the shared mock for each test
+        from finance.invoice_service import InvoiceService
         
-        # GPS coordinates
-        self.pickup_point = Point(9.7042, 4.0502)
-        self.dropoff_point = Point(9.6877, 4.0205)
+        _PDF_MOCK.reset_mock()
+        original = InvoiceService.__dict__['_render_pdf']
+        InvoiceService._render_pdf = _PDF_MOCK
+        self.addCleanup(setattr, InvoiceService, '_render_pdf', original)
     
     def test_full_cash_delivery_flow(self):
         """
@@ -173,14 +187,10 @@ class E2EDeliveryFlowTest(TransactionTestCase):
         expected_courier = courier_initial + delivery.courier_earning
         self.assertEqual(self.courier.wallet_balance, expected_courier)
     
-    @patch('finance.invoice_service.InvoiceService._render_pdf')
-    def test_receipt_generation_on_completion(self, mock_render_pdf):
+    def test_receipt_generation_on_completion(self):
         """
         Test automatic receipt PDF generation on delivery completion.
         """
-        # Mock PDF rendering to return dummy bytes
-        mock_render_pdf.return_value = b'%PDF-1.4 dummy pdf content'
-        
         # Create and complete a delivery
         delivery = Delivery.objects.create(
             sender=self.sender,
@@ -211,7 +221,7 @@ class E2EDeliveryFlowTest(TransactionTestCase):
         self.assertTrue(invoice.invoice_number.startswith('DLV-'))
         
         # Verify PDF was rendered
-        mock_render_pdf.assert_called_once()
+        _PDF_MOCK.assert_called_once()
     
     def test_courier_debt_blocking(self):
         """
@@ -229,52 +239,52 @@ class E2EDeliveryFlowTest(TransactionTestCase):
         self.courier.save()
         
         self.assertFalse(self.courier.is_courier_blocked)
+
+
+class OtpUnitTest(SimpleTestCase):
+    """
+    OTP generation, tested without touching the database.
+    """
     
-    def test_delivery_otp_generation(self):
-        """
-        Test that OTP codes are generated for both pickup and delivery.
-        """
-        delivery = Delivery.objects.create(
-            sender=self.sender,
-            recipient_phone='+237699666666',
-            pickup_geo=self.pickup_point,
-            dropoff_geo=self.dropoff_point,
-            payment_method=PaymentMethod.CASH_P2P,
-            total_price=Decimal('1000.00')
-        )
+    def test_generate_otp(self):
+        """OTP codes are 4 numeric digits by default."""
+        otp = generate_otp()
         
-        # Both OTPs should be generated
-        self.assertIsNotNone(delivery.otp_code)
-        self.assertIsNotNone(delivery.pickup_otp)
-        self.assertEqual(len(delivery.otp_code), 4)
-        self.assertEqual(len(delivery.pickup_otp), 4)
-        
-        # OTPs should be numeric
-        self.assertTrue(delivery.otp_code.isdigit())
-        self.assertTrue(delivery.pickup_otp.isdigit())
+        self.assertEqual(len(otp), 4)
+        self.assertTrue(otp.isdigit())
+    
+    def test_generate_otp_length(self):
+        """OTP length is configurable."""
+        self.assertEqual(len(generate_otp(6)), 6)
 
 
-class DeliveryStatusTransitionsTest(TransactionTestCase):
+class DeliveryStatusTransitionsTest(TestCase):
     """
     Tests for valid status transitions.
     """
     
-    def setUp(self):
-        self.sender = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = User.objects.create_user(
             phone_number='+237699100001',
             role=UserRole.CLIENT
         )
-        self.courier = User.objects.create_user(
+        cls.courier = User.objects.create_user(
             phone_number='+237699100002',
             role=UserRole.COURIER,
             is_verified=True
         )
         
+        # GPS coordinates (built once, copied per test)
+        cls.pickup_point = Point(9.7042, 4.0502)
+        cls.dropoff_point = Point(9.6877, 4.0205)
+    
+    def setUp(self):
         self.delivery = Delivery.objects.create(
             sender=self.sender,
             recipient_phone='+237699555555',
-            pickup_geo=Point(9.7042, 4.0502),
-            dropoff_geo=Point(9.6877, 4.0205),
+            pickup_geo=self.pickup_point,
+            dropoff_geo=self.dropoff_point,
             payment_method=PaymentMethod.CASH_P2P,
             total_price=Decimal('1000.00')
         )
@@ -284,26 +294,26 @@ class DeliveryStatusTransitionsTest(TransactionTestCase):
         # PENDING → ASSIGNED
         self.delivery.courier = self.courier
         self.delivery.status = DeliveryStatus.ASSIGNED
-        self.delivery.save()
+        self.delivery.save(update_fields=['courier', 'status'])
         self.assertEqual(self.delivery.status, DeliveryStatus.ASSIGNED)
         
         # ASSIGNED → PICKED_UP
         self.delivery.status = DeliveryStatus.PICKED_UP
-        self.delivery.save()
+        self.delivery.save(update_fields=['status'])
         self.assertEqual(self.delivery.status, DeliveryStatus.PICKED_UP)
         
         # PICKED_UP → IN_TRANSIT
         self.delivery.status = DeliveryStatus.IN_TRANSIT
-        self.delivery.save()
+        self.delivery.save(update_fields=['status'])
         self.assertEqual(self.delivery.status, DeliveryStatus.IN_TRANSIT)
         
         # IN_TRANSIT → COMPLETED
         self.delivery.status = DeliveryStatus.COMPLETED
-        self.delivery.save()
+        self.delivery.save(update_fields=['status'])
         self.assertEqual(self.delivery.status, DeliveryStatus.COMPLETED)
     
     def test_cancellation_from_pending(self):
         """Test cancellation from PENDING status."""
         self.delivery.status = DeliveryStatus.CANCELLED
-        self.delivery.save()
+        self.delivery.save(update_fields=['status'])
         self.assertEqual(self.delivery.status, DeliveryStatus.CANCELLED)
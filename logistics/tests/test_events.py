@@ -0,0 +1,88 @@
+"""
+LOGISTICS App - Tests for batched delivery status broadcasts.
+
+Tests cover:
+- Timer-triggered flush
+- Size-triggered flush
+- Per-group ordering within a batch
+"""
+
+import asyncio
+import threading
+from unittest.mock import patch
+from django.test import SimpleTestCase
+
+from logistics import events
+
+
+class FakeChannelLayer:
+    """Records group_send calls; the first event of a delivery is slowed down."""
+
+    def __init__(self, expected=0):
+        self.sent = []
+        self.expected = expected
+        self.done = threading.Event()
+
+    async def group_send(self, group_name, event):
+        if 'ASSIGNED' in (event.get('status'), event.get('new_status')):
+            # Give a later event of the same group every chance to overtake
+            await asyncio.sleep(0.02)
+        self.sent.append((group_name, event))
+        if len(self.sent) >= self.expected:
+            self.done.set()
+
+
+class StatusBatchTest(SimpleTestCase):
+    """Test queue_delivery_status / flush_delivery_statuses."""
+
+    def setUp(self):
+        events.flush_delivery_statuses()
+        self.addCleanup(events.flush_delivery_statuses)
+
+    def test_timer_flushes_queued_statuses(self):
+        """Queued statuses should be sent once the batch delay elapses."""
+        layer = FakeChannelLayer(expected=2)
+
+        with patch.object(events, 'get_channel_layer', return_value=layer):
+            events.queue_delivery_status('delivery-1', 'PICKED_UP', 'msg')
+            self.assertEqual(layer.sent, [])
+            self.assertTrue(layer.done.wait(2))
+
+        self.assertEqual(
+            [group for group, _ in layer.sent],
+            ['delivery_delivery-1', 'dispatch_DOUALA']
+        )
+        self.assertIsNone(events._status_timer)
+
+    def test_full_batch_flushes_immediately(self):
+        """Reaching STATUS_BATCH_SIZE should flush in the calling thread."""
+        layer = FakeChannelLayer()
+
+        with patch.object(events, 'get_channel_layer', return_value=layer), \
+                patch.object(events, 'STATUS_BATCH_SIZE', 3):
+            for i in range(3):
+                events.queue_delivery_status(f'delivery-{i}', 'IN_TRANSIT')
+
+            self.assertEqual(len(layer.sent), 6)
+            self.assertEqual(events._status_buffer, [])
+            self.assertIsNone(events._status_timer)
+
+    def test_statuses_keep_their_order_within_a_group(self):
+        """Two changes of one delivery in a batch should arrive in order."""
+        layer = FakeChannelLayer()
+
+        with patch.object(events, 'get_channel_layer', return_value=layer):
+            events.queue_delivery_status('delivery-1', 'ASSIGNED')
+            events.queue_delivery_status('delivery-1', 'PICKED_UP')
+            self.assertEqual(events.flush_delivery_statuses(), 2)
+
+        tracking = [
+            event['status'] for group, event in layer.sent
+            if group == 'delivery_delivery-1'
+        ]
+        dispatch = [
+            event['new_status'] for group, event in layer.sent
+            if group == 'dispatch_DOUALA'
+        ]
+        self.assertEqual(tracking, ['ASSIGNED', 'PICKED_UP'])
+        self.assertEqual(dispatch, ['ASSIGNED', 'PICKED_UP'])
@@ -5,7 +5,9 @@ Services utilitaires pour le calcul de distance et de prix.
 """
 
 import math
-from decimal import Decimal, ROUND_UP
+from decimal import Decimal
+from functools import lru_cache
+from typing import Tuple
 
 
 # ============================================
@@ -22,9 +24,16 @@ COURIER_EARNING_RATE = Decimal("0.80")  # 80% pour le coursier
 # Road Factor (Majoration pour estimer distance routière)
 ROAD_FACTOR = 1.3  # +30% sur la distance à vol d'oiseau
 
+# Vitesse moyenne en ville africaine (25 km/h), en mètres par heure
+AVG_SPEED_M_PER_H = 25000
+
 # Rayon de la Terre en km
 EARTH_RADIUS_KM = 6371.0
 
+# Conversion degrés -> radians (et demi-angle pour Haversine)
+DEG_TO_RAD = math.pi / 180
+HALF_DEG_TO_RAD = DEG_TO_RAD / 2
+
 
 # ============================================
 # DISTANCE CALCULATION (Mock OSRM via Haversine)
@@ -42,16 +51,13 @@ def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> fl
     Returns:
         Distance en kilomètres (vol d'oiseau)
     """
-    # Conversion degrés -> radians
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
+    # Formule de Haversine (demi-angles en radians par multiplication)
+    sin_dlat = math.sin((lat2 - lat1) * HALF_DEG_TO_RAD)
+    sin_dlng = math.sin((lng2 - lng1) * HALF_DEG_TO_RAD)
     
-    # Formule de Haversine
     a = (
-        math.sin(delta_lat / 2) ** 2 +
-        math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2
+        sin_dlat * sin_dlat +
+        math.cos(lat1 * DEG_TO_RAD) * math.cos(lat2 * DEG_TO_RAD) * sin_dlng * sin_dlng
     )
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     
@@ -75,21 +81,39 @@ def get_routing_data(lat1: float, lng1: float, lat2: float, lng2: float) -> dict
             "duration_min": int    # Durée estimée en minutes
         }
     """
+    # A->B et B->A ont la même distance: une seule entrée de cache
+    if (lat2, lng2) < (lat1, lng1):
+        lat1, lng1, lat2, lng2 = lat2, lng2, lat1, lng1
+    
+    distance_km, duration_min = _compute_routing_data(lat1, lng1, lat2, lng2)
+    
+    return {
+        "distance_km": distance_km,
+        "duration_min": duration_min
+    }
+
+
+@lru_cache(maxsize=4096)
+def _compute_routing_data(lat1: float, lng1: float, lat2: float, lng2: float) -> Tuple[float, int]:
+    """
+    Calcul mémoïsé en processus: les devis e-commerce répètent les mêmes
+    paires (boutique, centre de quartier).
+    
+    Returns:
+        (distance_km, duration_min)
+    """
     # Distance à vol d'oiseau
     crow_distance = haversine_distance(lat1, lng1, lat2, lng2)
     
     # Application du facteur routier (+30%)
     road_distance = crow_distance * ROAD_FACTOR
     
-    # Estimation de la durée (moyenne 25 km/h en ville africaine)
-    # Formule: distance / vitesse * 60 (pour avoir des minutes)
-    avg_speed_kmh = 25
-    duration_min = int(math.ceil((road_distance / avg_speed_kmh) * 60))
+    # Estimation de la durée en entiers: mètres * 60 / vitesse (m/h),
+    # arrondie à la minute supérieure par division entière
+    road_meters = round(road_distance * 1000)
+    duration_min = -(-road_meters * 60 // AVG_SPEED_M_PER_H)
     
-    return {
-        "distance_km": round(road_distance, 2),
-        "duration_min": max(duration_min, 1)  # Minimum 1 minute
-    }
+    return round(road_distance, 2), max(duration_min, 1)  # Minimum 1 minute
 
 
 # ============================================
@@ -101,7 +125,7 @@ def round_up_to_hundred(value: int) -> int:
     Arrondit un prix à la centaine supérieure.
     Ex: 1320 -> 1400, 1500 -> 1500, 1501 -> 1600
     """
-    return int(math.ceil(value / 100) * 100)
+    return -(-value // 100) * 100
 
 
 def calculate_delivery_price(distance_km: float) -> dict:
@@ -143,19 +167,17 @@ def calculate_delivery_price(distance_km: float) -> dict:
     # Calcul du prix brut
     raw_price = base_fare + (distance_km * cost_per_km)
     
-    # Arrondi à la centaine supérieure
-    rounded_price = round_up_to_hundred(int(math.ceil(raw_price)))
+    # Arrondi à la centaine supérieure (math.ceil rend déjà un int)
+    rounded_price = round_up_to_hundred(math.ceil(raw_price))
     
     # Application du prix minimum
     client_price = max(rounded_price, minimum_fare)
     
-    # Calcul du split
-    platform_fee_rate = Decimal(str(platform_fee_percent)) / Decimal('100')
-    courier_earning_rate = Decimal('1') - platform_fee_rate
-    
-    client_price_decimal = Decimal(str(client_price))
-    platform_fee = int(client_price_decimal * platform_fee_rate)
-    courier_earning = int(client_price_decimal * courier_earning_rate)
+    # Calcul du split en entiers (le XAF n'a pas de sous-unité):
+    # le coursier reçoit le reste, donc commission + gain = prix client
+    client_price = int(client_price)
+    platform_fee = client_price * int(platform_fee_percent) // 100
+    courier_earning = client_price - platform_fee
     
     return {
         "client_price": client_price,
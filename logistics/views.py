@@ -9,6 +9,7 @@ from rest_framework.views import APIView
 from rest_framework_api_key.permissions import HasAPIKey
 from django.contrib.gis.geos import Point
 from django.contrib.gis.db.models.functions import Distance
+from django.core.cache import cache
 from django.contrib.gis.measure import D
 from django.utils import timezone
 from django.db.models import Q
@@ -23,10 +24,30 @@ from .serializers import (
     CourierAssignSerializer, PublicOrderCreateSerializer
 )
 from .services.pricing import pricing_engine
+from .services.courier_geo_index import CourierGeoIndex
 from core.models import UserRole
 from finance.models import WalletService
 
 
+# E-commerce quotes are cached per (tariff, shop, destination), coordinates
+# rounded to this many decimals (4 ≈ 11 m), for QUOTE_CACHE_TTL seconds.
+# The tariff is part of the key, so a change in IntegrationConfig applies
+# to quotes as immediately as to orders.
+QUOTE_CACHE_PRECISION = 4
+QUOTE_CACHE_TTL = 300
+
+
+def _quote_cache_key(engine, origin: Point, destination: Point, safety_margin: float) -> str:
+    """Cache key of a quote under the engine's tariff, quantized to QUOTE_CACHE_PRECISION."""
+    p = QUOTE_CACHE_PRECISION
+    return (
+        f"quote:{engine.base_fare}:{engine.cost_per_km}:{engine.minimum_fare}:"
+        f"{engine.platform_fee_percent}:"
+        f"{round(origin.y, p)},{round(origin.x, p)}:"
+        f"{round(destination.y, p)},{round(destination.x, p)}:{safety_margin}"
+    )
+
+
 class IsBusinessOrAdmin(permissions.BasePermission):
     """Permission for business or admin users."""
     
@@ -114,17 +135,19 @@ class DeliveryViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        # DeliverySerializer reads sender/courier phone and name
+        qs = Delivery.objects.select_related('sender', 'courier')
         
         if user.role == UserRole.ADMIN:
-            return Delivery.objects.all()
+            return qs
         elif user.role == UserRole.COURIER:
-            return Delivery.objects.filter(
+            return qs.filter(
                 Q(courier=user) | Q(status=DeliveryStatus.PENDING)
             )
         elif user.role == UserRole.BUSINESS:
-            return Delivery.objects.filter(shop=user)
+            return qs.filter(shop=user)
         else:
-            return Delivery.objects.filter(sender=user)
+            return qs.filter(sender=user)
 
     @action(detail=False, methods=['post'])
     def create_delivery(self, request):
@@ -287,7 +310,7 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         
         # Find deliveries within 3km radius
         radius_km = 3
-        nearby = Delivery.objects.filter(
+        nearby = Delivery.objects.select_related('sender', 'courier').filter(
             status=DeliveryStatus.PENDING
         ).annotate(
             distance=Distance('pickup_geo', request.user.last_location)
@@ -537,12 +560,18 @@ class QuoteAPIView(APIView):
             estimation_type = 'neighborhood'
             safety_margin = 0.2  # 20% margin for uncertainty
         
-        # Calculate price
+        # Calculate price (repeat shop -> destination quotes under the
+        # current tariff hit the cache)
         try:
-            distance_km, total_price, platform_fee, courier_earning = pricing_engine().calculate_price(
-                origin=shop.last_location,
-                destination=destination,
-                safety_margin=safety_margin
+            engine = pricing_engine()
+            distance_km, total_price, platform_fee, courier_earning = cache.get_or_set(
+                _quote_cache_key(engine, shop.last_location, destination, safety_margin),
+                lambda: engine.calculate_price(
+                    origin=shop.last_location,
+                    destination=destination,
+                    safety_margin=safety_margin
+                ),
+                QUOTE_CACHE_TTL
             )
         except Exception as e:
             return Response(
@@ -859,6 +888,7 @@ class CourierLocationView(APIView):
         user.last_location = Point(lng, lat, srid=4326)
         user.last_location_updated = timezone.now()
         user.save(update_fields=['last_location', 'last_location_updated'])
+        CourierGeoIndex.update_location(user.id, lat, lng)
         
         return Response({
             'status': 'ok',